@@ -13,26 +13,307 @@
 """
 
 import logging
+import asyncio
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
+from telegram.error import BadRequest
 from datetime import datetime, timedelta
 import json
 import os
+import time
 import shutil
-from typing import Dict, Any, List
+import gzip
+import sqlite3
+import tempfile
+from typing import Dict, Any, List, Tuple
+from functools import lru_cache
 # import pandas as pd
 from pathlib import Path
+from sqlalchemy import select, func, case, tuple_, bindparam
 
-from database.models import User, Prediction, Transaction, get_db
+# ==================== zstd fallback ====================
+try:
+    import zstandard as zstd
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+# ==================== psutil fallback ====================
+# بدون psutil فقط فضای دیسک گزارش می‌شود
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+from database.models import User, Prediction, Transaction, RevenueAggregate, get_db, SessionLocal, approx_count, USER_BY_TELEGRAM_ID
+from utils.markdown import escape_markdown
 from config import *
 
 logger = logging.getLogger(__name__)
 
+# کش مقادیر سنگین صفحه‌ها: key -> (value, time)
+_page_cache: Dict[str, Any] = {}
+
+# اندازه تکه خواندن هنگام فشرده‌سازی پشتیبان (حافظه محدود، مستقل از حجم دیتابیس)
+BACKUP_CHUNK_SIZE = 1 << 20
+
+# فرمت زمان در cursor صفحه‌بندی (با میکروثانیه)
+CURSOR_TS_FORMAT = '%Y%m%d%H%M%S%f'
+
+# ایموجی وضعیت تراکنش
+_TX_STATUS_EMOJI = {
+    'completed': '✅',
+    'pending': '⏳',
+    'failed': '❌',
+    'expired': '⌛'
+}
+
+# متن تنظیمات فقط از config ساخته می‌شود؛ یک بار در import فرمت می‌شود
+_SETTINGS_TEXT = (
+    "⚙️ **System Settings**\n\n"
+    f"**Pricing:**\n"
+    f"• Basic: ${PRICES.basic_prediction}\n"
+    f"• Deep: ${PRICES.deep_analysis}\n"
+    f"• VIP Monthly: ${PRICES.vip_monthly}\n"
+    f"• Lifetime: ${PRICES.lifetime_access}\n\n"
+    
+    f"**Payment:**\n"
+    f"• Confirmations: {PAYMENT_CONFIRMATIONS_NEEDED}\n"
+    f"• Expiry: {PAYMENT_EXPIRY_HOURS}h\n"
+    f"• Welcome Bonus: ${WELCOME_BONUS}\n\n"
+    
+    f"**Features:**\n"
+    f"• AI Learning: {AUTO_LEARN}\n"
+    f"• Marketing: {ENABLE_SELF_MARKETING}\n"
+    f"• Referral Bonus: {REFERRAL_BONUS_PERCENT}%\n\n"
+    
+    f"**System:**\n"
+    f"• Log Level: {LOG_LEVEL}\n"
+    f"• Backup: {BACKUP_INTERVAL_HOURS}h\n"
+    f"• Retention: {KEEP_BACKUPS_DAYS} days"
+)
+
+# ==================== کوئری‌های آماده ====================
+# ساخت یک‌باره؛ SQL کامپایل‌شده توسط SQLAlchemy کش می‌شود و فقط پارامترها عوض می‌شوند
+
+_USER_STATS = select(
+    func.count(User.id),
+    func.sum(case((User.last_active >= bindparam('active_since'), 1), else_=0)),
+    func.sum(case((User.created_at >= bindparam('new_since'), 1), else_=0)),
+    func.sum(case((User.subscription_tier != 'free', 1), else_=0))
+)
+
+# درصد پیش‌بینی‌های درست، محاسبه در همان پیمایش
+_ACCURACY = func.coalesce(func.avg(case((Prediction.was_correct == True, 1.0), else_=0.0)) * 100, 0.0)
+
+_PREDICTION_STATS = select(
+    func.count(Prediction.id),
+    func.sum(case((Prediction.predicted_at >= bindparam('today_start'), 1), else_=0)),
+    _ACCURACY
+)
+
+_TX_STATS = select(
+    func.count(Transaction.id),
+    func.sum(case((Transaction.status == 'completed', Transaction.amount))),
+    func.sum(case((Transaction.status == 'pending', 1), else_=0)),
+    func.sum(case(
+        ((Transaction.tx_type == 'payment') & (Transaction.status == 'completed'), Transaction.amount)
+    ))
+)
+
+_USER_PREDICTION_STATS = select(
+    func.count(Prediction.id),
+    func.sum(case((Prediction.was_correct == True, 1), else_=0)),
+    _ACCURACY
+).where(Prediction.user_id == bindparam('user_id'))
+
+_USER_TX_STATS = select(
+    func.count(Transaction.id),
+    func.sum(case(
+        ((Transaction.tx_type == 'payment') & (Transaction.status == 'completed'), Transaction.amount),
+        else_=0
+    ))
+).where(Transaction.user_id == bindparam('user_id'))
+
+# قالب گزارش سلامت سیستم
+_HEALTH_TEMPLATE = (
+    "🏥 **System Health Check**\n\n"
+    "{status}\n\n"
+    "Disk: {free_gb:.1f} GB free\n"
+    "Memory: {memory_percent}% used\n"
+    "CPU: {cpu_percent}%"
+)
+
+_USERS_ACTIVE = select(func.count(User.id)).where(User.last_active >= bindparam('since'))
+_TX_VOLUME = select(func.sum(Transaction.amount))
+
+# ==================== کیبوردهای ثابت ====================
+# یک بار در زمان import ساخته می‌شوند (اشیای تلگرام تغییرناپذیرند)
+
+_ADMIN_MENU = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("📊 Dashboard", callback_data='admin_dashboard'),
+        InlineKeyboardButton("👥 Users", callback_data='admin_users')
+    ],
+    [
+        InlineKeyboardButton("💰 Transactions", callback_data='admin_transactions'),
+        InlineKeyboardButton("🔮 Predictions", callback_data='admin_predictions')
+    ],
+    [
+        InlineKeyboardButton("⚙️ Settings", callback_data='admin_settings'),
+        InlineKeyboardButton("📢 Broadcast", callback_data='admin_broadcast')
+    ],
+    [
+        InlineKeyboardButton("💾 Backup", callback_data='admin_backup'),
+        InlineKeyboardButton("📋 Logs", callback_data='admin_logs')
+    ],
+    [
+        InlineKeyboardButton("📊 Reports", callback_data='admin_reports'),
+        InlineKeyboardButton("🔧 Maintenance", callback_data='admin_maintenance')
+    ],
+    [
+        InlineKeyboardButton("🔙 Back to Bot", callback_data='back_main')
+    ]
+])
+
+_DASHBOARD_MENU = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🔄 Refresh", callback_data='admin_dashboard'),
+        InlineKeyboardButton("📊 Detailed", callback_data='admin_stats_detailed')
+    ],
+    [InlineKeyboardButton("🔙 Back", callback_data='admin_menu')]
+])
+
+_SETTINGS_MENU = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("💰 Prices", callback_data='admin_settings_prices'),
+        InlineKeyboardButton("💳 Wallet", callback_data='admin_settings_wallet')
+    ],
+    [
+        InlineKeyboardButton("🤖 AI", callback_data='admin_settings_ai'),
+        InlineKeyboardButton("📊 Features", callback_data='admin_settings_features')
+    ],
+    [
+        InlineKeyboardButton("🔧 Advanced", callback_data='admin_settings_advanced'),
+        InlineKeyboardButton("💾 Save", callback_data='admin_settings_save')
+    ],
+    [InlineKeyboardButton("🔙 Back", callback_data='admin_menu')]
+])
+
+_BROADCAST_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔙 Back", callback_data='admin_menu')]
+])
+
+_BACKUP_MENU = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🆕 Create Backup", callback_data='admin_backup_create'),
+        InlineKeyboardButton("🔄 Restore", callback_data='admin_backup_restore')
+    ],
+    [
+        InlineKeyboardButton("📥 Download", callback_data='admin_backup_download'),
+        InlineKeyboardButton("🗑️ Clean Old", callback_data='admin_backup_clean')
+    ],
+    [InlineKeyboardButton("🔙 Back", callback_data='admin_menu')]
+])
+
+_LOGS_MENU = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🔄 Refresh", callback_data='admin_logs'),
+        InlineKeyboardButton("📥 Download", callback_data='admin_logs_download')
+    ],
+    [
+        InlineKeyboardButton("❌ Errors Only", callback_data='admin_logs_errors'),
+        InlineKeyboardButton("🗑️ Clear", callback_data='admin_logs_clear')
+    ],
+    [InlineKeyboardButton("🔙 Back", callback_data='admin_menu')]
+])
+
+_REPORTS_MENU = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("📅 Daily", callback_data='admin_report_daily'),
+        InlineKeyboardButton("📆 Weekly", callback_data='admin_report_weekly')
+    ],
+    [
+        InlineKeyboardButton("📊 Monthly", callback_data='admin_report_monthly'),
+        InlineKeyboardButton("💰 Revenue", callback_data='admin_report_revenue')
+    ],
+    [
+        InlineKeyboardButton("👥 Users", callback_data='admin_report_users'),
+        InlineKeyboardButton("🔮 Predictions", callback_data='admin_report_predictions')
+    ],
+    [InlineKeyboardButton("🔙 Back", callback_data='admin_menu')]
+])
+
+_MAINTENANCE_MENU = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🧹 Clear Cache", callback_data='admin_maint_cache'),
+        InlineKeyboardButton("⚡ Optimize DB", callback_data='admin_maint_optimize')
+    ],
+    [
+        InlineKeyboardButton("🗑️ Clean Old", callback_data='admin_maint_clean'),
+        InlineKeyboardButton("🏥 Health Check", callback_data='admin_maint_health')
+    ],
+    [
+        InlineKeyboardButton("🔄 Restart Bot", callback_data='admin_maint_restart'),
+        InlineKeyboardButton("⚠️ Reset System", callback_data='admin_maint_reset')
+    ],
+    [InlineKeyboardButton("🔙 Back", callback_data='admin_menu')]
+])
+
+# ردیف‌های ثابت پایین لیست‌ها (دکمه‌های صفحه‌بندی پویا هستند)
+_USERS_FOOTER = [
+    [
+        InlineKeyboardButton("🔍 Search", callback_data='admin_user_search'),
+        InlineKeyboardButton("📊 Export", callback_data='admin_users_export')
+    ],
+    [InlineKeyboardButton("🔙 Back", callback_data='admin_menu')]
+]
+
+_TXS_FOOTER = [
+    [
+        InlineKeyboardButton("🔍 Search", callback_data='admin_tx_search'),
+        InlineKeyboardButton("📊 Export", callback_data='admin_txs_export')
+    ],
+    [InlineKeyboardButton("🔙 Back", callback_data='admin_menu')]
+]
+
+@lru_cache(maxsize=256)
+def _user_detail_menu(user_id: int) -> InlineKeyboardMarkup:
+    """کیبورد جزئیات کاربر؛ فقط user_id متغیر است و برای هر کاربر یک بار ساخته می‌شود"""
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton("➕ Add Balance", callback_data=f'admin_user_add_{user_id}'),
+            InlineKeyboardButton("➖ Deduct", callback_data=f'admin_user_deduct_{user_id}')
+        ],
+        [
+            InlineKeyboardButton("📝 Edit", callback_data=f'admin_user_edit_{user_id}'),
+            InlineKeyboardButton("🚫 Ban", callback_data=f'admin_user_ban_{user_id}')
+        ],
+        [
+            InlineKeyboardButton("📊 Predictions", callback_data=f'admin_user_preds_{user_id}'),
+            InlineKeyboardButton("💰 Transactions", callback_data=f'admin_user_txs_{user_id}')
+        ],
+        [InlineKeyboardButton("🔙 Back", callback_data='admin_users')]
+    ])
+
 class AdminPanel:
     """
     پنل مدیریت با دسترسی‌های سطح بالا
     """
     
+    # مدت اعتبار کش آمار داشبورد (ثانیه)
+    STATS_CACHE_TTL = 60
+    
+    # تعداد ارسال هم‌زمان در پیام همگانی (تلگرام ~۳۰ پیام در ثانیه)
+    BROADCAST_CONCURRENCY = 25
+    
+    # فاصله نمونه‌برداری منابع سیستم (ثانیه)
+    SYS_SAMPLE_INTERVAL = 5
+    
+    # مدت اعتبار کش اطلاعات فایل‌ها (حجم دیتابیس و بک‌آپ‌ها)
+    FS_CACHE_TTL = 30
+    
     def __init__(self, db_session=None):
         self.db = db_session
         
@@ -41,51 +322,49 @@ class AdminPanel:
         
         # آمار کش
         self.stats_cache = {}
-        self.cache_time = datetime.now()
+        # زمان‌های کش با ساعت monotonic (فقط برای مقایسه TTL)
+        self.cache_time = 0.0
+        self._stats_lock = asyncio.Lock()
+        
+        # آخرین نمونه منابع سیستم (توسط تسک پس‌زمینه به‌روز می‌شود)
+        self._sys_snapshot = {}
+        self._sampler_task = None
+        
+        # کش اطلاعات فایل‌ها
+        self._fs_snapshot = {}
+        self._fs_time = 0.0
     
     def is_admin(self, user_id: int) -> bool:
         """بررسی ادمین بودن کاربر"""
         return user_id in self.admin_ids
     
+    async def _render(self, update: Update, text: str, **kwargs):
+        """نمایش صفحه: ویرایش همان پیام برای دکمه‌ها، پیام جدید برای دستورها"""
+        query = update.callback_query
+        if query is None:
+            await update.message.reply_text(text, **kwargs)
+            return
+        
+        try:
+            await query.edit_message_text(text, **kwargs)
+        except BadRequest as e:
+            # رفرش بدون تغییر محتوا خطا نیست
+            if 'not modified' not in str(e):
+                raise
+    
     # ==================== منوی اصلی مدیریت ====================
     
     def get_admin_menu(self) -> InlineKeyboardMarkup:
         """منوی اصلی پنل مدیریت"""
         
-        buttons = [
-            [
-                InlineKeyboardButton("📊 Dashboard", callback_data='admin_dashboard'),
-                InlineKeyboardButton("👥 Users", callback_data='admin_users')
-            ],
-            [
-                InlineKeyboardButton("💰 Transactions", callback_data='admin_transactions'),
-                InlineKeyboardButton("🔮 Predictions", callback_data='admin_predictions')
-            ],
-            [
-                InlineKeyboardButton("⚙️ Settings", callback_data='admin_settings'),
-                InlineKeyboardButton("📢 Broadcast", callback_data='admin_broadcast')
-            ],
-            [
-                InlineKeyboardButton("💾 Backup", callback_data='admin_backup'),
-                InlineKeyboardButton("📋 Logs", callback_data='admin_logs')
-            ],
-            [
-                InlineKeyboardButton("📊 Reports", callback_data='admin_reports'),
-                InlineKeyboardButton("🔧 Maintenance", callback_data='admin_maintenance')
-            ],
-            [
-                InlineKeyboardButton("🔙 Back to Bot", callback_data='back_main')
-            ]
-        ]
-        
-        return InlineKeyboardMarkup(buttons)
+        return _ADMIN_MENU
     
     # ==================== داشبورد ====================
     
     async def show_dashboard(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """نمایش داشبورد مدیریت"""
         
-        stats = self.get_dashboard_stats()
+        stats = await self.get_dashboard_stats()
         
         text = (
             "📊 **Admin Dashboard**\n\n"
@@ -115,140 +394,183 @@ class AdminPanel:
             f"🕐 Last Update: {datetime.now().strftime('%H:%M:%S')}"
         )
         
-        buttons = [
-            [
-                InlineKeyboardButton("🔄 Refresh", callback_data='admin_dashboard'),
-                InlineKeyboardButton("📊 Detailed", callback_data='admin_stats_detailed')
-            ],
-            [InlineKeyboardButton("🔙 Back", callback_data='admin_menu')]
-        ]
-        
-        await update.message.reply_text(
+        await self._render(
+            update,
             text,
-            reply_markup=InlineKeyboardMarkup(buttons),
+            reply_markup=_DASHBOARD_MENU,
             parse_mode='Markdown'
         )
     
-    def get_dashboard_stats(self) -> Dict:
+    async def get_dashboard_stats(self) -> Dict:
         """گرفتن آمار داشبورد"""
         
         if not self.db:
             return {}
         
-        now = datetime.now()
-        yesterday = now - timedelta(days=1)
-        week_ago = now - timedelta(days=7)
-        
-        # آمار کاربران
-        total_users = self.db.query(User).count()
-        active_24h = self.db.query(User).filter(User.last_active >= yesterday).count()
-        new_7d = self.db.query(User).filter(User.created_at >= week_ago).count()
-        vip_users = self.db.query(User).filter(User.subscription_tier != 'free').count()
-        
-        # آمار پیش‌بینی‌ها
-        total_preds = self.db.query(Prediction).count()
-        today_preds = self.db.query(Prediction).filter(
-            Prediction.predicted_at >= now.replace(hour=0, minute=0, second=0)
-        ).count()
-        
-        # محاسبه دقت
-        correct_preds = self.db.query(Prediction).filter(Prediction.was_correct == True).count()
-        accuracy = (correct_preds / total_preds * 100) if total_preds > 0 else 0
-        
-        # درآمد
-        total_revenue = self.db.query(Transaction).filter(
-            Transaction.tx_type == 'payment',
-            Transaction.status == 'completed'
-        ).with_entities(func.sum(Transaction.amount)).scalar() or 0
-        
-        # تراکنش‌ها
-        total_txs = self.db.query(Transaction).count()
-        total_volume = self.db.query(Transaction).with_entities(
-            func.sum(Transaction.amount)
-        ).filter(Transaction.status == 'completed').scalar() or 0
-        pending_txs = self.db.query(Transaction).filter(Transaction.status == 'pending').count()
-        
-        # سیستم
-        db_file = Path('data/oracle.db')
-        db_size = f"{db_file.stat().st_size / 1024 / 1024:.1f} MB" if db_file.exists() else "0 MB"
-        
-        # آخرین بک‌آپ
-        backup_dir = Path('backups')
-        last_backup = "Never"
-        if backup_dir.exists():
-            backups = list(backup_dir.glob('*.sqlite'))
-            if backups:
-                last_backup = max(backups, key=lambda p: p.stat().st_mtime).name
+        # استفاده از کش اگر هنوز معتبر است
+        if self._stats_cache_valid():
+            return self.stats_cache
         
-        return {
-            'users': {
-                'total': total_users,
-                'active_24h': active_24h,
-                'new_7d': new_7d,
-                'vip': vip_users
-            },
-            'predictions': {
-                'total': total_preds,
-                'today': today_preds,
-                'accuracy': accuracy,
-                'revenue': total_revenue
-            },
-            'transactions': {
-                'total': total_txs,
-                'volume': total_volume,
-                'pending': pending_txs
-            },
-            'system': {
-                'uptime': '2 days',  # TODO
-                'db_size': db_size,
-                'cache_size': '0 MB',
-                'last_backup': last_backup
+        # فقط یک درخواست هم‌زمان به دیتابیس می‌رود، بقیه منتظر نتیجه می‌مانند
+        async with self._stats_lock:
+            if self._stats_cache_valid():
+                return self.stats_cache
+            
+            now = datetime.now()
+            loop = asyncio.get_running_loop()
+            
+            # کوئری‌های مستقل به صورت موازی، هر کدام با session جدا
+            users, predictions, transactions, system = await asyncio.gather(
+                loop.run_in_executor(None, self._query_user_stats, now),
+                loop.run_in_executor(None, self._query_prediction_stats, now),
+                loop.run_in_executor(None, self._query_transaction_stats),
+                self._system_stats()
+            )
+            
+            self.stats_cache = {
+                'users': users,
+                'predictions': {**predictions, 'revenue': transactions.pop('revenue')},
+                'transactions': transactions,
+                'system': system
             }
+            self.cache_time = time.monotonic()
+            
+            return self.stats_cache
+    
+    def _stats_cache_valid(self) -> bool:
+        """بررسی اعتبار کش آمار"""
+        return bool(self.stats_cache) and \
+            time.monotonic() - self.cache_time < self.STATS_CACHE_TTL
+    
+    def _query_user_stats(self, now: datetime) -> Dict:
+        """آمار کاربران (یک پیمایش با شمارش شرطی)"""
+        db = SessionLocal()
+        try:
+            total, active_24h, new_7d, vip = db.execute(_USER_STATS, {
+                'active_since': now - timedelta(days=1),
+                'new_since': now - timedelta(days=7)
+            }).one()
+        finally:
+            db.close()
+        
+        return {
+            'total': total,
+            'active_24h': active_24h or 0,
+            'new_7d': new_7d or 0,
+            'vip': vip or 0
+        }
+    
+    def _query_prediction_stats(self, now: datetime) -> Dict:
+        """آمار پیش‌بینی‌ها"""
+        today_start = now.replace(hour=0, minute=0, second=0)
+        db = SessionLocal()
+        try:
+            total, today, accuracy = db.execute(_PREDICTION_STATS, {'today_start': today_start}).one()
+        finally:
+            db.close()
+        
+        return {
+            'total': total or 0,
+            'today': today or 0,
+            'accuracy': accuracy
+        }
+    
+    def _query_transaction_stats(self) -> Dict:
+        """آمار تراکنش‌ها و درآمد"""
+        db = SessionLocal()
+        try:
+            total, volume, pending, revenue = db.execute(_TX_STATS).one()
+        finally:
+            db.close()
+        
+        return {
+            'total': total,
+            'volume': volume or 0,
+            'pending': pending or 0,
+            'revenue': revenue or 0
         }
     
+    async def _system_stats(self) -> Dict:
+        """آمار سیستم (حجم دیتابیس و آخرین بک‌آپ)"""
+        fs = await self._fs_stats()
+        
+        return {
+            'uptime': '2 days',  # TODO
+            'db_size': f"{fs['db_size'] / 1024 / 1024:.1f} MB",
+            'cache_size': '0 MB',
+            'last_backup': fs['backups'][0]['name'] if fs['backups'] else "Never"
+        }
+    
+    async def _fs_stats(self) -> Dict:
+        """اطلاعات فایل‌ها با کش کوتاه‌مدت؛ خواندن دیسک در thread جدا"""
+        if self._fs_snapshot and \
+                time.monotonic() - self._fs_time < self.FS_CACHE_TTL:
+            return self._fs_snapshot
+        
+        self._fs_snapshot = await asyncio.to_thread(self._sample_fs)
+        self._fs_time = time.monotonic()
+        return self._fs_snapshot
+    
+    def _sample_fs(self) -> Dict:
+        """حجم دیتابیس و لیست بک‌آپ‌ها (جدیدترین اول) با یک پیمایش scandir"""
+        try:
+            db_size = os.stat('data/oracle.db').st_size
+        except FileNotFoundError:
+            db_size = 0
+        
+        backups = []
+        try:
+            with os.scandir('backups') as entries:
+                for entry in entries:
+                    if entry.is_file() and '.sqlite' in entry.name:
+                        st = entry.stat()
+                        backups.append({'name': entry.name, 'size': st.st_size, 'mtime': st.st_mtime})
+        except FileNotFoundError:
+            pass
+        
+        backups.sort(key=lambda b: b['mtime'], reverse=True)
+        return {'db_size': db_size, 'backups': backups}
+    
     # ==================== مدیریت کاربران ====================
     
-    async def show_users(self, update: Update, context: ContextTypes.DEFAULT_TYPE, page: int = 0):
+    async def show_users(self, update: Update, context: ContextTypes.DEFAULT_TYPE, cursor: str = None):
         """نمایش لیست کاربران"""
         
         if not self.db:
             return
         
         per_page = 10
-        users = self.db.query(User).order_by(User.created_at.desc()).offset(page * per_page).limit(per_page).all()
-        total = self.db.query(User).count()
-        pages = (total + per_page - 1) // per_page
+        users, has_prev, has_next = self._keyset_page(User, cursor, per_page)
+        total = approx_count(self.db, User.__table__)
         
-        text = f"👥 **Users (Page {page+1}/{pages})**\n\n"
+        parts = ["👥 **Users**\n\n"]
         
         for user in users:
-            text += (
+            parts.append(
                 f"🆔 `{user.telegram_id}` | "
-                f"@{user.username or 'no username'} | "
+                f"@{escape_markdown(user.username or 'no username')} | "
                 f"${user.balance:.2f} | "
                 f"{user.subscription_tier.upper()}\n"
             )
         
-        text += f"\nTotal: {total} users"
+        parts.append(f"\nTotal: {total} users")
+        text = "".join(parts)
         
         buttons = []
         nav_buttons = []
         
-        if page > 0:
-            nav_buttons.append(InlineKeyboardButton("◀️ Prev", callback_data=f'admin_users_{page-1}'))
-        if page < pages - 1:
-            nav_buttons.append(InlineKeyboardButton("Next ▶️", callback_data=f'admin_users_{page+1}'))
+        if has_prev:
+            nav_buttons.append(InlineKeyboardButton("◀️ Prev", callback_data=f'admin_users_{self._make_cursor("p", users[0])}'))
+        if has_next:
+            nav_buttons.append(InlineKeyboardButton("Next ▶️", callback_data=f'admin_users_{self._make_cursor("n", users[-1])}'))
         
         if nav_buttons:
             buttons.append(nav_buttons)
         
-        buttons.append([
-            InlineKeyboardButton("🔍 Search", callback_data='admin_user_search'),
-            InlineKeyboardButton("📊 Export", callback_data='admin_users_export')
-        ])
-        buttons.append([InlineKeyboardButton("🔙 Back", callback_data='admin_menu')])
+        buttons.extend(_USERS_FOOTER)
         
-        await update.message.reply_text(
+        await self._render(
+            update,
             text,
             reply_markup=InlineKeyboardMarkup(buttons),
             parse_mode='Markdown'
@@ -260,26 +582,23 @@ class AdminPanel:
         if not self.db:
             return
         
-        user = self.db.query(User).filter_by(telegram_id=user_id).first()
+        user = self.db.execute(USER_BY_TELEGRAM_ID, {'telegram_id': user_id}).scalar_one_or_none()
         if not user:
-            await update.message.reply_text("User not found")
+            await self._render(update, "User not found", reply_markup=_ADMIN_MENU)
             return
         
-        # آمار کاربر
-        predictions = self.db.query(Prediction).filter_by(user_id=user.id).count()
-        correct = self.db.query(Prediction).filter_by(user_id=user.id, was_correct=True).count()
-        accuracy = (correct / predictions * 100) if predictions > 0 else 0
+        # آمار کاربر (یک کوئری برای هر جدول با شمارش شرطی)
+        predictions, correct, accuracy = self.db.execute(_USER_PREDICTION_STATS, {'user_id': user.id}).one()
+        correct = correct or 0
         
-        transactions = self.db.query(Transaction).filter_by(user_id=user.id).count()
-        total_spent = self.db.query(Transaction).filter_by(
-            user_id=user.id, tx_type='payment', status='completed'
-        ).with_entities(func.sum(Transaction.amount)).scalar() or 0
+        transactions, total_spent = self.db.execute(_USER_TX_STATS, {'user_id': user.id}).one()
+        total_spent = total_spent or 0
         
         text = (
             f"👤 **User Details**\n\n"
             f"🆔 ID: `{user.telegram_id}`\n"
-            f"👤 Username: @{user.username or 'N/A'}\n"
-            f"📝 Name: {user.first_name or ''} {user.last_name or ''}\n"
+            f"👤 Username: @{escape_markdown(user.username or 'N/A')}\n"
+            f"📝 Name: {escape_markdown(user.first_name or '')} {escape_markdown(user.last_name or '')}\n"
             f"📅 Joined: {user.created_at.strftime('%Y-%m-%d %H:%M')}\n"
             f"⏱ Last Active: {user.last_active.strftime('%Y-%m-%d %H:%M')}\n\n"
             
@@ -296,132 +615,114 @@ class AdminPanel:
             f"• Soul Urge: {user.soul_urge or 'N/A'}\n"
         )
         
-        buttons = [
-            [
-                InlineKeyboardButton("➕ Add Balance", callback_data=f'admin_user_add_{user_id}'),
-                InlineKeyboardButton("➖ Deduct", callback_data=f'admin_user_deduct_{user_id}')
-            ],
-            [
-                InlineKeyboardButton("📝 Edit", callback_data=f'admin_user_edit_{user_id}'),
-                InlineKeyboardButton("🚫 Ban", callback_data=f'admin_user_ban_{user_id}')
-            ],
-            [
-                InlineKeyboardButton("📊 Predictions", callback_data=f'admin_user_preds_{user_id}'),
-                InlineKeyboardButton("💰 Transactions", callback_data=f'admin_user_txs_{user_id}')
-            ],
-            [InlineKeyboardButton("🔙 Back", callback_data='admin_users')]
-        ]
-        
-        await update.message.reply_text(
+        await self._render(
+            update,
             text,
-            reply_markup=InlineKeyboardMarkup(buttons),
+            reply_markup=_user_detail_menu(user_id),
             parse_mode='Markdown'
         )
     
     # ==================== مدیریت تراکنش‌ها ====================
     
-    async def show_transactions(self, update: Update, context: ContextTypes.DEFAULT_TYPE, page: int = 0):
+    async def show_transactions(self, update: Update, context: ContextTypes.DEFAULT_TYPE, cursor: str = None):
         """نمایش تراکنش‌ها"""
         
         if not self.db:
             return
         
         per_page = 10
-        txs = self.db.query(Transaction).order_by(Transaction.created_at.desc()).offset(page * per_page).limit(per_page).all()
-        total = self.db.query(Transaction).count()
-        pages = (total + per_page - 1) // per_page
+        txs, has_prev, has_next = self._keyset_page(Transaction, cursor, per_page)
+        total = approx_count(self.db, Transaction.__table__)
         
-        text = f"💰 **Transactions (Page {page+1}/{pages})**\n\n"
+        parts = ["💰 **Transactions**\n\n"]
         
         for tx in txs:
-            status_emoji = {
-                'completed': '✅',
-                'pending': '⏳',
-                'failed': '❌',
-                'expired': '⌛'
-            }.get(tx.status, '❓')
+            status_emoji = _TX_STATUS_EMOJI.get(tx.status, '❓')
             
-            text += (
+            parts.append(
                 f"{status_emoji} `{tx.tx_hash[:10]}...` | "
                 f"${tx.amount:.2f} | "
                 f"{tx.tx_type} | "
                 f"{tx.created_at.strftime('%H:%M')}\n"
             )
         
-        text += f"\nTotal: {total} transactions"
-        text += f"\nVolume: ${self.db.query(Transaction).with_entities(func.sum(Transaction.amount)).scalar() or 0:.2f}"
+        parts.append(f"\nTotal: {total} transactions")
+        parts.append(f"\nVolume: ${self._get_cached_scalar('tx_volume', _TX_VOLUME):.2f}")
+        text = "".join(parts)
         
         buttons = []
         nav_buttons = []
         
-        if page > 0:
-            nav_buttons.append(InlineKeyboardButton("◀️ Prev", callback_data=f'admin_transactions_{page-1}'))
-        if page < pages - 1:
-            nav_buttons.append(InlineKeyboardButton("Next ▶️", callback_data=f'admin_transactions_{page+1}'))
+        if has_prev:
+            nav_buttons.append(InlineKeyboardButton("◀️ Prev", callback_data=f'admin_transactions_{self._make_cursor("p", txs[0])}'))
+        if has_next:
+            nav_buttons.append(InlineKeyboardButton("Next ▶️", callback_data=f'admin_transactions_{self._make_cursor("n", txs[-1])}'))
         
         if nav_buttons:
             buttons.append(nav_buttons)
         
-        buttons.append([
-            InlineKeyboardButton("🔍 Search", callback_data='admin_tx_search'),
-            InlineKeyboardButton("📊 Export", callback_data='admin_txs_export')
-        ])
-        buttons.append([InlineKeyboardButton("🔙 Back", callback_data='admin_menu')])
+        buttons.extend(_TXS_FOOTER)
         
-        await update.message.reply_text(
+        await self._render(
+            update,
             text,
             reply_markup=InlineKeyboardMarkup(buttons),
             parse_mode='Markdown'
         )
     
+    def _keyset_page(self, model, cursor: str, per_page: int) -> Tuple[List, bool, bool]:
+        """
+        صفحه‌بندی keyset روی (created_at, id) به ترتیب نزولی
+        
+        Args:
+            cursor: 'n<ts>_<id>' برای صفحه بعد، 'p<ts>_<id>' برای صفحه قبل
+        
+        Returns:
+            (ردیف‌ها, صفحه قبل دارد, صفحه بعد دارد)
+        """
+        key = tuple_(model.created_at, model.id)
+        query = self.db.query(model)
+        
+        if cursor:
+            ts, row_id = cursor[1:].split('_')
+            boundary = tuple_(datetime.strptime(ts, CURSOR_TS_FORMAT), int(row_id))
+            
+            if cursor[0] == 'p':
+                # حرکت به عقب: صعودی می‌خوانیم و برعکس می‌کنیم
+                rows = query.filter(key > boundary).order_by(
+                    model.created_at.asc(), model.id.asc()
+                ).limit(per_page + 1).all()
+                return rows[:per_page][::-1], len(rows) > per_page, bool(rows)
+            
+            query = query.filter(key < boundary)
+        
+        rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(per_page + 1).all()
+        return rows[:per_page], bool(cursor and rows), len(rows) > per_page
+    
+    def _make_cursor(self, direction: str, row) -> str:
+        """ساخت cursor صفحه‌بندی از یک ردیف"""
+        return f"{direction}{row.created_at.strftime(CURSOR_TS_FORMAT)}_{row.id}"
+    
+    def _get_cached_scalar(self, key: str, statement) -> Any:
+        """اجرای یک کوئری تک‌مقداری با کش"""
+        
+        cached = _page_cache.get(key)
+        if cached and time.monotonic() - cached[1] < self.STATS_CACHE_TTL:
+            return cached[0]
+        
+        value = self.db.execute(statement).scalar() or 0
+        _page_cache[key] = (value, time.monotonic())
+        return value
+    
     # ==================== تنظیمات ====================
     
     async def show_settings(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """نمایش تنظیمات"""
         
-        text = (
-            "⚙️ **System Settings**\n\n"
-            f"**Pricing:**\n"
-            f"• Basic: ${PRICING['basic_prediction']}\n"
-            f"• Deep: ${PRICING['deep_analysis']}\n"
-            f"• VIP Monthly: ${PRICING['vip_monthly']}\n"
-            f"• Lifetime: ${PRICING['lifetime_access']}\n\n"
-            
-            f"**Payment:**\n"
-            f"• Confirmations: {PAYMENT_CONFIRMATIONS_NEEDED}\n"
-            f"• Expiry: {PAYMENT_EXPIRY_HOURS}h\n"
-            f"• Welcome Bonus: ${WELCOME_BONUS}\n\n"
-            
-            f"**Features:**\n"
-            f"• AI Learning: {AUTO_LEARN}\n"
-            f"• Marketing: {ENABLE_SELF_MARKETING}\n"
-            f"• Referral Bonus: {REFERRAL_BONUS_PERCENT}%\n\n"
-            
-            f"**System:**\n"
-            f"• Log Level: {LOG_LEVEL}\n"
-            f"• Backup: {BACKUP_INTERVAL_HOURS}h\n"
-            f"• Retention: {KEEP_BACKUPS_DAYS} days"
-        )
-        
-        buttons = [
-            [
-                InlineKeyboardButton("💰 Prices", callback_data='admin_settings_prices'),
-                InlineKeyboardButton("💳 Wallet", callback_data='admin_settings_wallet')
-            ],
-            [
-                InlineKeyboardButton("🤖 AI", callback_data='admin_settings_ai'),
-                InlineKeyboardButton("📊 Features", callback_data='admin_settings_features')
-            ],
-            [
-                InlineKeyboardButton("🔧 Advanced", callback_data='admin_settings_advanced'),
-                InlineKeyboardButton("💾 Save", callback_data='admin_settings_save')
-            ],
-            [InlineKeyboardButton("🔙 Back", callback_data='admin_menu')]
-        ]
-        
-        await update.message.reply_text(
-            text,
-            reply_markup=InlineKeyboardMarkup(buttons),
+        await self._render(
+            update,
+            _SETTINGS_TEXT,
+            reply_markup=_SETTINGS_MENU,
             parse_mode='Markdown'
         )
     
@@ -433,10 +734,10 @@ class AdminPanel:
         if not self.db:
             return
         
-        total_users = self.db.query(User).count()
-        active_users = self.db.query(User).filter(
-            User.last_active >= datetime.now() - timedelta(days=7)
-        ).count()
+        total_users = approx_count(self.db, User.__table__)
+        active_users = self.db.execute(
+            _USERS_ACTIVE, {'since': datetime.now() - timedelta(days=7)}
+        ).scalar()
         
         text = (
             "📢 **Broadcast Message**\n\n"
@@ -446,13 +747,10 @@ class AdminPanel:
             "(You can use Markdown)"
         )
         
-        buttons = [
-            [InlineKeyboardButton("🔙 Back", callback_data='admin_menu')]
-        ]
-        
-        await update.message.reply_text(
+        await self._render(
+            update,
             text,
-            reply_markup=InlineKeyboardMarkup(buttons),
+            reply_markup=_BROADCAST_MENU,
             parse_mode='Markdown'
         )
         
@@ -464,30 +762,60 @@ class AdminPanel:
         if not self.db:
             return
         
-        users = self.db.query(User).filter(User.is_active == True).all()
-        sent = 0
-        failed = 0
+        # session جدا برای cursor ارسال؛ در طول awaitها باز می‌ماند و نباید با self.db مشترک باشد
+        db = SessionLocal()
+        try:
+            sent, failed = await self._broadcast_to_active(update, context, db, message)
+        finally:
+            db.close()
         
-        await update.message.reply_text(f"📤 Sending to {len(users)} users...")
+        await update.message.reply_text(
+            f"✅ Broadcast completed!\n"
+            f"Recipients: {sent + failed}\n"
+            f"Sent: {sent}\n"
+            f"Failed: {failed}"
+        )
+    
+    async def _broadcast_to_active(self, update: Update, context: ContextTypes.DEFAULT_TYPE, db, message: str) -> Tuple[int, int]:
+        """ارسال به کاربران فعال با خواندن دسته‌ای telegram_id از session داده‌شده"""
         
-        for user in users:
+        # فقط ستون telegram_id به صورت دسته‌ای خوانده می‌شود
+        active_ids = db.query(User.telegram_id).filter(User.is_active.is_(True))
+        
+        # تعداد گیرنده‌ها حین خواندن شمرده می‌شود (بدون COUNT(*) جدا روی کل جدول)
+        await update.message.reply_text("📤 Sending broadcast to active users...")
+        
+        semaphore = asyncio.Semaphore(self.BROADCAST_CONCURRENCY)
+        loop = asyncio.get_running_loop()
+        counts = {'sent': 0, 'failed': 0}
+        pending = set()
+        
+        async def send_one(telegram_id: int):
+            started = loop.time()
             try:
                 await context.bot.send_message(
-                    chat_id=user.telegram_id,
+                    chat_id=telegram_id,
                     text=message,
                     parse_mode='Markdown'
                 )
-                sent += 1
-                await asyncio.sleep(0.05)  # جلوگیری از rate limit
+                counts['sent'] += 1
             except Exception as e:
-                failed += 1
-                logger.error(f"Failed to send to {user.telegram_id}: {e}")
-        
-        await update.message.reply_text(
-            f"✅ Broadcast completed!\n"
-            f"Sent: {sent}\n"
-            f"Failed: {failed}"
-        )
+                counts['failed'] += 1
+                logger.error(f"Failed to send to {telegram_id}: {e}")
+            finally:
+                # هر جایگاه حداکثر یک پیام در ثانیه (جلوگیری از rate limit)
+                await asyncio.sleep(max(0.0, 1.0 - (loop.time() - started)))
+                semaphore.release()
+        
+        for (telegram_id,) in active_ids.yield_per(500):
+            # تا خالی شدن یک جایگاه، ردیف بعدی خوانده نمی‌شود
+            await semaphore.acquire()
+            task = asyncio.create_task(send_one(telegram_id))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        
+        await asyncio.gather(*pending)
+        return counts['sent'], counts['failed']
     
     # ==================== پشتیبان‌گیری ====================
     
@@ -497,43 +825,33 @@ class AdminPanel:
         backup_dir = Path('backups')
         backup_dir.mkdir(exist_ok=True)
         
-        backups = sorted(backup_dir.glob('*.sqlite'), key=lambda p: p.stat().st_mtime, reverse=True)
+        backups = (await self._fs_stats())['backups']
         
-        text = "💾 **Backup Manager**\n\n"
+        parts = ["💾 **Backup Manager**\n\n"]
         
         if backups:
-            text += "**Recent Backups:**\n"
+            parts.append("**Recent Backups:**\n")
             for backup in backups[:5]:
-                size = backup.stat().st_size / 1024 / 1024
-                modified = datetime.fromtimestamp(backup.stat().st_mtime).strftime('%Y-%m-%d %H:%M')
-                text += f"• {backup.name} ({size:.1f} MB) - {modified}\n"
+                size = backup['size'] / 1024 / 1024
+                modified = datetime.fromtimestamp(backup['mtime']).strftime('%Y-%m-%d %H:%M')
+                parts.append(f"• {backup['name']} ({size:.1f} MB) - {modified}\n")
         else:
-            text += "No backups found.\n"
-        
-        text += f"\nBackup Location: {backup_dir.absolute()}"
-        
-        buttons = [
-            [
-                InlineKeyboardButton("🆕 Create Backup", callback_data='admin_backup_create'),
-                InlineKeyboardButton("🔄 Restore", callback_data='admin_backup_restore')
-            ],
-            [
-                InlineKeyboardButton("📥 Download", callback_data='admin_backup_download'),
-                InlineKeyboardButton("🗑️ Clean Old", callback_data='admin_backup_clean')
-            ],
-            [InlineKeyboardButton("🔙 Back", callback_data='admin_menu')]
-        ]
+            parts.append("No backups found.\n")
         
-        await update.message.reply_text(
+        parts.append(f"\nBackup Location: {backup_dir.absolute()}")
+        text = "".join(parts)
+        
+        await self._render(
+            update,
             text,
-            reply_markup=InlineKeyboardMarkup(buttons),
+            reply_markup=_BACKUP_MENU,
             parse_mode='Markdown'
         )
     
     async def create_backup(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """ایجاد پشتیبان جدید"""
         
-        await update.message.reply_text("💾 Creating backup...")
+        await self._render(update, "💾 Creating backup...")
         
         try:
             backup_dir = Path('backups')
@@ -541,34 +859,58 @@ class AdminPanel:
             
             # نام فایل با تاریخ
             filename = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.sqlite"
+            filename += '.zst' if HAS_ZSTD else '.gz'
             backup_path = backup_dir / filename
             
-            # کپی دیتابیس
+            # کپی و فشرده‌سازی دیتابیس در یک مرحله
             db_path = Path('data/oracle.db')
             if db_path.exists():
-                shutil.copy2(db_path, backup_path)
+                await asyncio.to_thread(self._write_db_backup, db_path, backup_path)
+                self._fs_snapshot = {}
                 
-                # فشرده‌سازی
-                import gzip
-                with open(backup_path, 'rb') as f_in:
-                    with gzip.open(f"{backup_path}.gz", 'wb') as f_out:
-                        shutil.copyfileobj(f_in, f_out)
+                size = backup_path.stat().st_size / 1024
                 
-                # حذف فایل غیر فشرده
-                backup_path.unlink()
-                
-                size = (backup_path.stat().st_size if backup_path.exists() else 0) / 1024
-                
-                await update.message.reply_text(
+                await self._render(
+                    update,
                     f"✅ Backup created successfully!\n"
-                    f"File: {filename}.gz\n"
-                    f"Size: {size:.1f} KB"
+                    f"File: {filename}\n"
+                    f"Size: {size:.1f} KB",
+                    reply_markup=_BACKUP_MENU
                 )
             else:
-                await update.message.reply_text("❌ Database file not found!")
+                await self._render(update, "❌ Database file not found!", reply_markup=_BACKUP_MENU)
                 
         except Exception as e:
-            await update.message.reply_text(f"❌ Backup failed: {str(e)}")
+            await self._render(update, f"❌ Backup failed: {str(e)}", reply_markup=_BACKUP_MENU)
+    
+    def _write_db_backup(self, db_path: Path, backup_path: Path):
+        """
+        snapshot سازگار از دیتابیس با Online Backup API در فایل موقت،
+        سپس فشرده‌سازی جریانی تکه‌به‌تکه (zstd سطح ۳ چندهسته‌ای در صورت نصب، وگرنه gzip)
+        """
+        fd, tmp_name = tempfile.mkstemp(suffix='.sqlite', dir=backup_path.parent)
+        os.close(fd)
+        tmp_path = Path(tmp_name)
+        
+        try:
+            src = sqlite3.connect(db_path)
+            snapshot = sqlite3.connect(tmp_path)
+            try:
+                src.backup(snapshot)
+            finally:
+                snapshot.close()
+                src.close()
+            
+            with open(tmp_path, 'rb') as f_in:
+                if HAS_ZSTD:
+                    cctx = zstd.ZstdCompressor(level=3, threads=-1)
+                    with open(backup_path, 'wb') as f_out:
+                        cctx.copy_stream(f_in, f_out, read_size=BACKUP_CHUNK_SIZE, write_size=BACKUP_CHUNK_SIZE)
+                else:
+                    with gzip.open(backup_path, 'wb', compresslevel=1) as f_out:
+                        shutil.copyfileobj(f_in, f_out, BACKUP_CHUNK_SIZE)
+        finally:
+            tmp_path.unlink(missing_ok=True)
     
     # ==================== لاگ‌ها ====================
     
@@ -577,43 +919,48 @@ class AdminPanel:
         
         log_file = Path('logs/oracle.log')
         if not log_file.exists():
-            await update.message.reply_text("No log file found.")
+            await self._render(update, "No log file found.", reply_markup=_LOGS_MENU)
             return
         
         try:
             # خواندن آخرین خطوط
-            with open(log_file, 'r') as f:
-                all_lines = f.readlines()
-                last_lines = all_lines[-lines:]
+            last_lines = self._tail(log_file, lines)
             
-            text = f"📋 **Last {lines} Log Lines**\n\n"
-            text += "```\n"
-            text += ''.join(last_lines)
-            text += "```"
+            text = "".join((f"📋 **Last {lines} Log Lines**\n\n", "```\n", last_lines, "```"))
             
             if len(text) > 4000:
                 text = text[:4000] + "...\n```"
             
-            buttons = [
-                [
-                    InlineKeyboardButton("🔄 Refresh", callback_data='admin_logs'),
-                    InlineKeyboardButton("📥 Download", callback_data='admin_logs_download')
-                ],
-                [
-                    InlineKeyboardButton("❌ Errors Only", callback_data='admin_logs_errors'),
-                    InlineKeyboardButton("🗑️ Clear", callback_data='admin_logs_clear')
-                ],
-                [InlineKeyboardButton("🔙 Back", callback_data='admin_menu')]
-            ]
-            
-            await update.message.reply_text(
+            await self._render(
+                update,
                 text,
-                reply_markup=InlineKeyboardMarkup(buttons),
+                reply_markup=_LOGS_MENU,
                 parse_mode='Markdown'
             )
             
         except Exception as e:
-            await update.message.reply_text(f"❌ Error reading logs: {str(e)}")
+            await self._render(update, f"❌ Error reading logs: {str(e)}", reply_markup=_LOGS_MENU)
+    
+    def _tail(self, path: Path, lines: int, block_size: int = 65536) -> str:
+        """خواندن آخرین خطوط فایل از انتها، بدون خواندن کل فایل"""
+        
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            pos = f.tell()
+            chunks = []
+            newlines = 0
+            
+            # بلوک به بلوک به عقب تا پیدا شدن خطوط کافی
+            while pos > 0 and newlines <= lines:
+                step = min(block_size, pos)
+                pos -= step
+                f.seek(pos)
+                chunk = f.read(step)
+                chunks.append(chunk)
+                newlines += chunk.count(b'\n')
+        
+        data = b''.join(reversed(chunks))
+        return b''.join(data.splitlines(keepends=True)[-lines:]).decode('utf-8', errors='replace')
     
     # ==================== گزارش‌ها ====================
     
@@ -630,25 +977,10 @@ class AdminPanel:
             "• Export to CSV/Excel"
         )
         
-        buttons = [
-            [
-                InlineKeyboardButton("📅 Daily", callback_data='admin_report_daily'),
-                InlineKeyboardButton("📆 Weekly", callback_data='admin_report_weekly')
-            ],
-            [
-                InlineKeyboardButton("📊 Monthly", callback_data='admin_report_monthly'),
-                InlineKeyboardButton("💰 Revenue", callback_data='admin_report_revenue')
-            ],
-            [
-                InlineKeyboardButton("👥 Users", callback_data='admin_report_users'),
-                InlineKeyboardButton("🔮 Predictions", callback_data='admin_report_predictions')
-            ],
-            [InlineKeyboardButton("🔙 Back", callback_data='admin_menu')]
-        ]
-        
-        await update.message.reply_text(
+        await self._render(
+            update,
             text,
-            reply_markup=InlineKeyboardMarkup(buttons),
+            reply_markup=_REPORTS_MENU,
             parse_mode='Markdown'
         )
     
@@ -664,49 +996,48 @@ class AdminPanel:
             start = now.replace(hour=0, minute=0, second=0, microsecond=0)
             group_by = 'hour'
         elif period == 'weekly':
-            start = now - timedelta(days=7)
+            start = (now - timedelta(days=7)).replace(hour=0, minute=0, second=0, microsecond=0)
             group_by = 'day'
         else:  # monthly
-            start = now - timedelta(days=30)
+            start = (now - timedelta(days=30)).replace(hour=0, minute=0, second=0, microsecond=0)
             group_by = 'day'
         
-        # دریافت تراکنش‌ها
-        txs = self.db.query(Transaction).filter(
-            Transaction.created_at >= start,
-            Transaction.status == 'completed',
-            Transaction.tx_type == 'payment'
-        ).all()
-        
-        if not txs:
-            await update.message.reply_text(f"No transactions in this {period} period.")
+        # دریافت درآمد تجمیع شده (یک ردیف برای هر بازه)
+        buckets = self.db.query(
+            RevenueAggregate.bucket_ts,
+            RevenueAggregate.amount_sum,
+            RevenueAggregate.tx_count
+        ).filter(
+            RevenueAggregate.bucket_kind == group_by,
+            RevenueAggregate.bucket_ts >= start
+        ).order_by(RevenueAggregate.bucket_ts).all()
+        
+        if not buckets:
+            await self._render(update, f"No transactions in this {period} period.", reply_markup=_REPORTS_MENU)
             return
         
-        total = sum(tx.amount for tx in txs)
-        count = len(txs)
+        total = sum(b.amount_sum for b in buckets)
+        count = sum(b.tx_count for b in buckets)
         
         # گروه‌بندی
-        from collections import defaultdict
-        grouped = defaultdict(float)
-        for tx in txs:
-            if group_by == 'hour':
-                key = tx.created_at.strftime('%H:00')
-            else:
-                key = tx.created_at.strftime('%Y-%m-%d')
-            grouped[key] += tx.amount
-        
-        text = f"💰 **Revenue Report ({period.capitalize()})**\n\n"
-        text += f"Period: {start.strftime('%Y-%m-%d')} to {now.strftime('%Y-%m-%d')}\n"
-        text += f"Total: ${total:.2f}\n"
-        text += f"Transactions: {count}\n"
-        text += f"Average: ${total/count:.2f}\n\n"
-        
-        text += "**Breakdown:**\n"
+        key_format = '%H:00' if group_by == 'hour' else '%Y-%m-%d'
+        grouped = {b.bucket_ts.strftime(key_format): b.amount_sum for b in buckets}
+        
+        parts = [
+            f"💰 **Revenue Report ({period.capitalize()})**\n\n",
+            f"Period: {start.strftime('%Y-%m-%d')} to {now.strftime('%Y-%m-%d')}\n",
+            f"Total: ${total:.2f}\n",
+            f"Transactions: {count}\n",
+            f"Average: ${total/count:.2f}\n\n",
+            "**Breakdown:**\n"
+        ]
         for key, amount in sorted(grouped.items()):
-            text += f"• {key}: ${amount:.2f}\n"
+            parts.append(f"• {key}: ${amount:.2f}\n")
+        text = "".join(parts)
         
         # TODO: ارسال به‌عنوان فایل
         
-        await update.message.reply_text(text)
+        await self._render(update, text, reply_markup=_REPORTS_MENU)
     
     # ==================== نگهداری ====================
     
@@ -722,25 +1053,10 @@ class AdminPanel:
             "• System health check"
         )
         
-        buttons = [
-            [
-                InlineKeyboardButton("🧹 Clear Cache", callback_data='admin_maint_cache'),
-                InlineKeyboardButton("⚡ Optimize DB", callback_data='admin_maint_optimize')
-            ],
-            [
-                InlineKeyboardButton("🗑️ Clean Old", callback_data='admin_maint_clean'),
-                InlineKeyboardButton("🏥 Health Check", callback_data='admin_maint_health')
-            ],
-            [
-                InlineKeyboardButton("🔄 Restart Bot", callback_data='admin_maint_restart'),
-                InlineKeyboardButton("⚠️ Reset System", callback_data='admin_maint_reset')
-            ],
-            [InlineKeyboardButton("🔙 Back", callback_data='admin_menu')]
-        ]
-        
-        await update.message.reply_text(
+        await self._render(
+            update,
             text,
-            reply_markup=InlineKeyboardMarkup(buttons),
+            reply_markup=_MAINTENANCE_MENU,
             parse_mode='Markdown'
         )
     
@@ -755,31 +1071,66 @@ class AdminPanel:
         except:
             issues.append("❌ Database connection failed")
         
+        # منابع سیستم از آخرین نمونه کش‌شده (نمونه‌بردار توسط ربات شروع می‌شود)
+        if not self._sys_snapshot:
+            self._sys_snapshot = await asyncio.to_thread(self._sample_system)
+        snapshot = self._sys_snapshot
+        
         # بررسی دیسک
-        import shutil
-        disk = shutil.disk_usage('/')
-        free_gb = disk.free / (1024**3)
+        free_gb = snapshot['disk_free_gb']
         if free_gb < 1:
             issues.append(f"⚠️ Low disk space: {free_gb:.1f} GB free")
         
         # بررسی حافظه
-        import psutil
-        memory = psutil.virtual_memory()
-        if memory.percent > 90:
-            issues.append(f"⚠️ High memory usage: {memory.percent}%")
+        memory_percent = snapshot['memory_percent']
+        if memory_percent is not None and memory_percent > 90:
+            issues.append(f"⚠️ High memory usage: {memory_percent}%")
         
         # بررسی API‌ها
         # TODO
         
-        text = "🏥 **System Health Check**\n\n"
-        
-        if issues:
-            text += "**Issues Found:**\n" + "\n".join(issues)
-        else:
-            text += "✅ All systems operational!"
+        text = _HEALTH_TEMPLATE.format(
+            status=("**Issues Found:**\n" + "\n".join(issues)) if issues else "✅ All systems operational!",
+            free_gb=free_gb,
+            memory_percent='n/a' if memory_percent is None else memory_percent,
+            cpu_percent='n/a' if snapshot['cpu_percent'] is None else snapshot['cpu_percent']
+        )
         
-        text += f"\n\nDisk: {free_gb:.1f} GB free\n"
-        text += f"Memory: {memory.percent}% used\n"
-        text += f"CPU: {psutil.cpu_percent()}%"
+        await self._render(update, text, reply_markup=_MAINTENANCE_MENU)
+    
+    def start_system_sampler(self):
+        """
+        راه‌اندازی نمونه‌بردار پس‌زمینه منابع سیستم (داخل event loop)
+        مالک پنل در post_init صدا می‌زند و در post_shutdown با stop_system_sampler متوقف می‌کند
+        """
+        if self._sampler_task is not None and not self._sampler_task.done():
+            return
         
-        await update.message.reply_text(text)
+        if HAS_PSUTIL:
+            # اولین فراخوانی فقط مبنا را ثبت می‌کند
+            psutil.cpu_percent(interval=None)
+        self._sampler_task = asyncio.get_running_loop().create_task(self._sample_loop())
+    
+    def stop_system_sampler(self):
+        """توقف نمونه‌بردار پس‌زمینه"""
+        if self._sampler_task is not None:
+            self._sampler_task.cancel()
+            self._sampler_task = None
+    
+    async def _sample_loop(self):
+        """نمونه‌برداری دوره‌ای از دیسک، حافظه و CPU"""
+        while True:
+            try:
+                self._sys_snapshot = await asyncio.to_thread(self._sample_system)
+            except Exception as e:
+                logger.error(f"❌ System sampling error: {e}")
+            await asyncio.sleep(self.SYS_SAMPLE_INTERVAL)
+    
+    def _sample_system(self) -> Dict:
+        """یک نمونه از منابع سیستم (بدون بلاک: CPU از آخرین فراخوانی)"""
+        disk = shutil.disk_usage('/')
+        return {
+            'disk_free_gb': disk.free / (1024**3),
+            'memory_percent': psutil.virtual_memory().percent if HAS_PSUTIL else None,
+            'cpu_percent': psutil.cpu_percent(interval=None) if HAS_PSUTIL else None
+        }
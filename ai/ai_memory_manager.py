@@ -9,21 +9,97 @@
 """
 
 import pickle
+import pickletools
 import gzip
 import json
 import shutil
 from datetime import datetime, timedelta
 from pathlib import Path
 import threading
-import schedule
+import queue
+import asyncio
+import atexit
 import time
 import logging
 from typing import Dict, List, Any, Optional
 import hashlib
 import os
+import io
+import base64
+from collections import deque
+
+# ==================== cryptography fallback ====================
+# بدون cryptography، API keyها مثل نسخه قدیمی فقط base64 ذخیره می‌شوند (بدون رمزنگاری)
+try:
+    from cryptography.fernet import Fernet
+    HAS_FERNET = True
+except ImportError:
+    HAS_FERNET = False
+
+# ==================== xxhash fallback ====================
+try:
+    import xxhash
+    HAS_XXHASH = True
+except ImportError:
+    HAS_XXHASH = False
+
+# ==================== zstd fallback ====================
+try:
+    import zstandard as zstd
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
 
 logger = logging.getLogger(__name__)
 
+# سطح zstd: ذخیره ساعتی سریع، پشتیبان آرشیوی فشرده‌تر
+SAVE_ZSTD_LEVEL = 3
+BACKUP_ZSTD_LEVEL = 15
+
+# سطح gzip برای پشتیبان آرشیوی (وقتی zstd نصب نیست)
+BACKUP_GZIP_LEVEL = 6
+
+# پروتکل ۵: فریم‌بندی ۸ بایتی و read کمتر هنگام بارگذاری
+PICKLE_PROTOCOL = 5
+
+# shard‌های کوچک‌تر از این اندازه قبل از فشرده‌سازی با pickletools بهینه می‌شوند
+SMALL_SHARD_BYTES = 64 * 1024
+
+# پسوند فایل‌های فشرده جدید (فایل‌های gz قدیمی همچنان خوانده می‌شوند)
+COMPRESSED_SUFFIX = '.zst' if HAS_ZSTD else '.gz'
+
+def _open_compressed(path: Path, mode: str, level: int = SAVE_ZSTD_LEVEL, gzip_level: int = 1):
+    """باز کردن فایل فشرده بر اساس پسوند (zst یا gz)"""
+    if path.suffix == '.zst':
+        if mode == 'wb':
+            return zstd.ZstdCompressor(level=level, threads=-1).stream_writer(open(path, 'wb'))
+        # pickle به readline نیاز دارد
+        return io.BufferedReader(zstd.ZstdDecompressor().stream_reader(open(path, 'rb')))
+    return gzip.open(path, mode, compresslevel=gzip_level)
+
+# حداکثر تعداد نگهداری الگوها، یادگیری‌ها و پیش‌بینی‌ها
+MAX_HISTORY = 10000
+
+# حافظه‌هایی که صف با طول محدود هستند (حذف قدیمی‌ترین در O(1))
+HISTORY_TYPES = ('patterns', 'learnings', 'predictions')
+
+def _new_user_memories() -> Dict:
+    """
+    حافظه کاربران به صورت SoA: مقدار و زمان با کلید (user_id, key)
+    به‌علاوه ایندکس کلیدهای هر کاربر
+    """
+    return {'value': {}, 'timestamp': {}, 'index': {}}
+
+def _content_hash(blob: bytes) -> int:
+    """هش سریع محتوای shard برای تشخیص عدم تغییر"""
+    if HAS_XXHASH:
+        return xxhash.xxh3_64_intdigest(blob)
+    return int.from_bytes(hashlib.blake2b(blob, digest_size=8).digest(), 'big')
+
+def _format_ts(ts) -> str:
+    """timestamp عددی (نانوثانیه) به ISO؛ مقادیر قدیمی رشته‌ای دست‌نخورده"""
+    return datetime.fromtimestamp(ts / 1e9).isoformat() if isinstance(ts, int) else ts
+
 class AIMemoryManager:
     """
     مدیریت حافظه AI با پشتیبان‌گیری خودکار
@@ -32,23 +108,33 @@ class AIMemoryManager:
     def __init__(self, memory_dir: str = "memory", 
                  backup_dir: str = "backups/ai_memory",
                  auto_save_interval: int = 60,  # دقیقه
-                 compression: bool = True):
+                 compression: bool = True,
+                 compresslevel: int = 1,  # سطح gzip برای ذخیره دوره‌ای
+                 encryption_key: bytes = None):  # کلید Fernet برای API keyها
         
         self.memory_dir = Path(memory_dir)
         self.backup_dir = Path(backup_dir)
         self.auto_save_interval = auto_save_interval
         self.compression = compression
+        self.compresslevel = compresslevel
         
         # ایجاد پوشه‌ها
         self.memory_dir.mkdir(parents=True, exist_ok=True)
         self.backup_dir.mkdir(parents=True, exist_ok=True)
         
+        # رمزنگاری API keyها
+        if HAS_FERNET:
+            self._cipher = Fernet(encryption_key or self._load_encryption_key())
+        else:
+            self._cipher = None
+            logger.warning("⚠️ cryptography not installed; API keys will be stored base64-encoded only (NOT encrypted)")
+        
         # حافظه‌های مختلف
         self.memories = {
-            'patterns': [],        # الگوهای کشف شده
-            'learnings': [],        # یادگیری‌ها
-            'user_memories': {},    # حافظه کاربران
-            'predictions': [],       # پیش‌بینی‌های گذشته
+            'patterns': deque(maxlen=MAX_HISTORY),        # الگوهای کشف شده
+            'learnings': deque(maxlen=MAX_HISTORY),        # یادگیری‌ها
+            'user_memories': _new_user_memories(),    # حافظه کاربران
+            'predictions': deque(maxlen=MAX_HISTORY),       # پیش‌بینی‌های گذشته
             'correlations': {},      # همبستگی‌ها
             'api_keys': {},          # API keyهای ذخیره شده (encode شده)
             'stats': {}              # آمار
@@ -57,49 +143,128 @@ class AIMemoryManager:
         # لاک برای thread safety
         self.lock = threading.Lock()
         
+        # انواع حافظه‌ای که از آخرین ذخیره تغییر کرده‌اند
+        self._dirty = set()
+        
+        # صف نوشتن روی دیسک: (نوع حافظه، بایت‌های pickle)
+        self._write_queue = queue.Queue()
+        threading.Thread(target=self._writer_loop, daemon=True).start()
+        
+        # هش آخرین محتوای نوشته‌شده هر shard
+        self._last_hash = {}
+        
+        # تسک‌های ذخیره خودکار
+        self._auto_save_tasks = []
+        
+        # کش آمار فایل‌ها: (حجم حافظه، تعداد پشتیبان‌ها)؛ با هر نوشتن باطل می‌شود
+        self._fs_stats_cache = None
+        
         # بارگذاری حافظه قبلی
         self.load_memory()
         
-        # شروع thread پشتیبان‌گیری خودکار
+        # شروع پشتیبان‌گیری خودکار
         self.start_auto_save()
         
+        # ذخیره تغییرات و خالی کردن صف نویسنده هنگام خروج
+        atexit.register(self.close)
+        
         logger.info(f"🧠 AIMemoryManager initialized: {self.memory_dir}")
     
+    def _load_encryption_key(self) -> bytes:
+        """
+        کلید رمزنگاری از متغیر محیطی AI_MEMORY_KEY یا فایل محلی (در صورت نبود ساخته می‌شود)
+        
+        هشدار: فایل پیش‌فرض memory/.memory.key کنار داده‌های رمزشده است؛ اگر پوشه حافظه
+        (یا پشتیبان آن) نشت کند، رمزنگاری هیچ محافظتی ندارد. در محیط واقعی AI_MEMORY_KEY تنظیم شود.
+        """
+        
+        env_key = os.getenv('AI_MEMORY_KEY')
+        if env_key:
+            return env_key.encode()
+        
+        key_file = self.memory_dir / '.memory.key'
+        if key_file.exists():
+            return key_file.read_bytes()
+        
+        key = Fernet.generate_key()
+        key_file.write_bytes(key)
+        os.chmod(key_file, 0o600)
+        logger.info(f"🔐 New memory encryption key created: {key_file}")
+        return key
+    
     # ==================== توابع ذخیره و بارگذاری ====================
     
-    def save_memory(self, memory_type: str = None):
+    def save_memory(self, memory_type: str = None, force: bool = False):
         """
         ذخیره حافظه در فایل
+        بدون memory_type فقط انواع تغییرکرده ذخیره می‌شوند (force=True برای همه)
         """
+        # زیر لاک فقط snapshot گرفته می‌شود؛ فشرده‌سازی و نوشتن در thread نویسنده
         with self.lock:
             try:
                 if memory_type:
                     # ذخیره یک نوع خاص
-                    if memory_type in self.memories:
-                        self._save_single_memory(memory_type)
+                    types = [memory_type] if memory_type in self.memories else []
                 else:
-                    # ذخیره همه
-                    for mem_type in self.memories:
-                        self._save_single_memory(mem_type)
+                    # ذخیره همه یا فقط تغییرکرده‌ها
+                    types = list(self.memories if force else self._dirty)
                 
-                logger.debug(f"💾 Memory saved: {memory_type or 'all'}")
+                snapshots = [(mem_type, self._snapshot(mem_type)) for mem_type in types]
+                self._dirty.difference_update(types)
                 
             except Exception as e:
                 logger.error(f"Error saving memory: {e}")
+                return
+        
+        for item in snapshots:
+            self._write_queue.put(item)
+        
+        logger.debug(f"💾 Memory queued for save: {memory_type or ('all' if force else 'dirty')}")
     
-    def _save_single_memory(self, memory_type: str):
-        """ذخیره یک نوع حافظه"""
+    def flush(self):
+        """انتظار تا نوشته شدن همه snapshot‌های صف‌شده"""
+        self._write_queue.join()
+    
+    def _snapshot(self, memory_type: str) -> bytes:
+        """pickle یک نوع حافظه (باید زیر لاک صدا زده شود)"""
+        return pickle.dumps(self.memories[memory_type], protocol=PICKLE_PROTOCOL)
+    
+    def _writer_loop(self):
+        """thread نویسنده: snapshot‌ها را بدون نگه داشتن لاک روی دیسک می‌نویسد"""
+        while True:
+            memory_type, blob = self._write_queue.get()
+            try:
+                self._write_shard(memory_type, blob)
+            except Exception as e:
+                logger.error(f"Error writing memory {memory_type}: {e}")
+            finally:
+                self._write_queue.task_done()
+    
+    def _write_shard(self, memory_type: str, blob: bytes):
+        """نوشتن یک نوع حافظه روی دیسک"""
+        
+        # اگر محتوا با آخرین نسخه نوشته‌شده یکی است، فشرده‌سازی و نوشتن لازم نیست
+        content_hash = _content_hash(blob)
+        if self._last_hash.get(memory_type) == content_hash:
+            return
+        
+        # حذف opcodeهای PUT بی‌استفاده؛ برای shard بزرگ هزینه کپی بیشتر از سود است
+        if len(blob) < SMALL_SHARD_BYTES:
+            blob = pickletools.optimize(blob)
         
         file_path = self.memory_dir / f"{memory_type}.pkl"
         
         # فشرده‌سازی اگر لازم باشد
         if self.compression:
-            file_path = Path(str(file_path) + ".gz")
-            with gzip.open(file_path, 'wb') as f:
-                pickle.dump(self.memories[memory_type], f)
+            file_path = Path(str(file_path) + COMPRESSED_SUFFIX)
+            with _open_compressed(file_path, 'wb', gzip_level=self.compresslevel) as f:
+                f.write(blob)
         else:
             with open(file_path, 'wb') as f:
-                pickle.dump(self.memories[memory_type], f)
+                f.write(blob)
+        
+        self._last_hash[memory_type] = content_hash
+        self._fs_stats_cache = None
     
     def load_memory(self):
         """بارگذاری حافظه از فایل"""
@@ -107,37 +272,40 @@ class AIMemoryManager:
         with self.lock:
             for memory_type in self.memories.keys():
                 self._load_single_memory(memory_type)
+            self._upgrade_memories(self.memories)
             
             logger.info(f"📚 Memory loaded: {len(self.memories['patterns'])} patterns, "
                        f"{len(self.memories['learnings'])} learnings, "
-                       f"{len(self.memories['user_memories'])} users")
+                       f"{len(self.memories['user_memories']['index'])} users")
     
     def _load_single_memory(self, memory_type: str):
         """بارگذاری یک نوع حافظه"""
         
-        # بررسی فایل معمولی
-        file_path = self.memory_dir / f"{memory_type}.pkl"
-        if file_path.exists():
-            with open(file_path, 'rb') as f:
-                self.memories[memory_type] = pickle.load(f)
-            return
+        # جدیدترین فایل موجود (معمولی، gz یا zst)
+        candidates = [f"{memory_type}.pkl", f"{memory_type}.pkl.gz"]
+        if HAS_ZSTD:
+            candidates.append(f"{memory_type}.pkl.zst")
+        existing = [p for p in (self.memory_dir / name for name in candidates) if p.exists()]
         
-        # بررسی فایل فشرده
-        gz_path = self.memory_dir / f"{memory_type}.pkl.gz"
-        if gz_path.exists():
-            with gzip.open(gz_path, 'rb') as f:
-                self.memories[memory_type] = pickle.load(f)
+        if existing:
+            file_path = max(existing, key=lambda p: p.stat().st_mtime)
+            if file_path.suffix == '.pkl':
+                with open(file_path, 'rb') as f:
+                    self.memories[memory_type] = pickle.load(f)
+            else:
+                with _open_compressed(file_path, 'rb') as f:
+                    self.memories[memory_type] = pickle.load(f)
             return
         
         # اگر فایل نبود، مقدار پیش‌فرض
         if memory_type == 'patterns':
-            self.memories[memory_type] = []
+            self.memories[memory_type] = deque(maxlen=MAX_HISTORY)
         elif memory_type == 'learnings':
-            self.memories[memory_type] = []
+            self.memories[memory_type] = deque(maxlen=MAX_HISTORY)
         elif memory_type == 'user_memories':
-            self.memories[memory_type] = {}
+            self.memories[memory_type] = _new_user_memories()
         elif memory_type == 'predictions':
-            self.memories[memory_type] = []
+            self.memories[memory_type] = deque(maxlen=MAX_HISTORY)
         elif memory_type == 'correlations':
             self.memories[memory_type] = {}
         elif memory_type == 'api_keys':
@@ -145,6 +313,26 @@ class AIMemoryManager:
         elif memory_type == 'stats':
             self.memories[memory_type] = {}
     
+    def _upgrade_memories(self, memories: Dict):
+        """تبدیل ساختارهای قدیمی فایل‌ها به ساختار فعلی"""
+        
+        # لیست‌های قدیمی -> deque با طول محدود
+        for memory_type in HISTORY_TYPES:
+            items = memories.get(memory_type)
+            if not isinstance(items, deque) or items.maxlen != MAX_HISTORY:
+                memories[memory_type] = deque(items or (), maxlen=MAX_HISTORY)
+        
+        user_memories = memories.get('user_memories') or {}
+        if 'index' not in user_memories:
+            # قدیمی: {user_id: {key: {'value', 'timestamp'}}}
+            upgraded = _new_user_memories()
+            for user_id, entries in user_memories.items():
+                for key, data in entries.items():
+                    upgraded['value'][(user_id, key)] = data['value']
+                    upgraded['timestamp'][(user_id, key)] = data['timestamp']
+                upgraded['index'][user_id] = set(entries)
+            memories['user_memories'] = upgraded
+    
     # ==================== توابع پشتیبان‌گیری ====================
     
     def create_backup(self, backup_name: str = None) -> Dict:
@@ -156,38 +344,44 @@ class AIMemoryManager:
         if not backup_name:
             backup_name = f"ai_memory_backup_{timestamp}"
         
-        backup_file = self.backup_dir / f"{backup_name}.pkl.gz"
+        backup_file = self.backup_dir / f"{backup_name}.pkl{COMPRESSED_SUFFIX}"
         
         try:
             # ذخیره موقت همه حافظه‌ها
             self.save_memory()
             
-            # ایجاد بسته کامل
-            complete_memory = {
+            # manifest در خط اول، سپس یک فریم pickle برای هر نوع حافظه
+            manifest = {
                 'timestamp': timestamp,
-                'version': '1.0',
-                'memories': self.memories,
+                'version': '2.0',
+                'types': list(self.memories.keys()),
                 'stats': {
                     'patterns': len(self.memories['patterns']),
                     'learnings': len(self.memories['learnings']),
-                    'users': len(self.memories['user_memories']),
+                    'users': len(self.memories['user_memories']['index']),
                     'predictions': len(self.memories['predictions'])
                 }
             }
             
-            # فشرده‌سازی و ذخیره
-            with gzip.open(backup_file, 'wb') as f:
-                pickle.dump(complete_memory, f)
+            # فشرده‌سازی و ذخیره جریانی (در هر لحظه فقط یک نوع حافظه در بافر pickle)
+            with _open_compressed(backup_file, 'wb', BACKUP_ZSTD_LEVEL, BACKUP_GZIP_LEVEL) as f:
+                f.write(json.dumps(manifest).encode() + b'\n')
+                for memory_type in manifest['types']:
+                    with self.lock:
+                        blob = self._snapshot(memory_type)
+                    f.write(blob)
             
             size_mb = backup_file.stat().st_size / (1024 * 1024)
             
+            self._fs_stats_cache = None
+            
             logger.info(f"💾 AI Memory backup created: {backup_file} ({size_mb:.2f} MB)")
             
             return {
                 'success': True,
                 'file': str(backup_file),
                 'size_mb': round(size_mb, 2),
-                'stats': complete_memory['stats']
+                'stats': manifest['stats']
             }
             
         except Exception as e:
@@ -204,21 +398,30 @@ class AIMemoryManager:
             return {'success': False, 'error': 'Backup file not found'}
         
         try:
-            with gzip.open(backup_path, 'rb') as f:
-                complete_memory = pickle.load(f)
+            with _open_compressed(backup_path, 'rb') as f:
+                if f.peek(1)[:1] == b'{':
+                    # فرمت جریانی: manifest و سپس فریم‌های جدا
+                    manifest = json.loads(f.readline())
+                    memories = {t: pickle.load(f) for t in manifest['types']}
+                else:
+                    # فرمت قدیمی: یک pickle کامل
+                    manifest = pickle.load(f)
+                    memories = manifest['memories']
+            
+            self._upgrade_memories(memories)
             
             with self.lock:
-                self.memories = complete_memory['memories']
-                
-                # ذخیره بعد از بازیابی
-                self.save_memory()
+                self.memories = memories
+            
+            # ذخیره بعد از بازیابی
+            self.save_memory(force=True)
             
             logger.info(f"✅ AI Memory restored from: {backup_file}")
             
             return {
                 'success': True,
-                'timestamp': complete_memory.get('timestamp'),
-                'stats': complete_memory.get('stats')
+                'timestamp': manifest.get('timestamp'),
+                'stats': manifest.get('stats')
             }
             
         except Exception as e:
@@ -228,35 +431,42 @@ class AIMemoryManager:
     def list_backups(self) -> List[Dict]:
         """لیست پشتیبان‌های موجود"""
         
+        # یک stat برای هر فایل
+        entries = [(entry.name, entry.stat()) for entry in self._scan_backups()]
+        entries.sort(key=lambda item: item[1].st_mtime, reverse=True)
+        
+        now = datetime.now()
         backups = []
-        for backup_file in sorted(self.backup_dir.glob("ai_memory_backup_*.pkl.gz"),
-                                  key=lambda p: p.stat().st_mtime,
-                                  reverse=True):
-            
-            mtime = datetime.fromtimestamp(backup_file.stat().st_mtime)
-            size_mb = backup_file.stat().st_size / (1024 * 1024)
+        for name, st in entries:
+            mtime = datetime.fromtimestamp(st.st_mtime)
             
             backups.append({
-                'name': backup_file.name,
+                'name': name,
                 'date': mtime.strftime('%Y-%m-%d %H:%M:%S'),
-                'size_mb': round(size_mb, 2),
-                'age_days': round((datetime.now() - mtime).days, 1)
+                'size_mb': round(st.st_size / (1024 * 1024), 2),
+                'age_days': round((now - mtime).days, 1)
             })
         
         return backups
     
+    def _scan_backups(self) -> List[os.DirEntry]:
+        """فایل‌های پشتیبان حافظه با یک پیمایش scandir"""
+        with os.scandir(self.backup_dir) as it:
+            return [entry for entry in it
+                    if entry.name.startswith('ai_memory_backup_') and '.pkl.' in entry.name]
+    
     def cleanup_old_backups(self, keep_days: int = 30):
         """پاک کردن پشتیبان‌های قدیمی"""
         
-        cutoff = datetime.now() - timedelta(days=keep_days)
+        cutoff = (datetime.now() - timedelta(days=keep_days)).timestamp()
         deleted = 0
         
-        for backup_file in self.backup_dir.glob("ai_memory_backup_*.pkl.gz"):
-            mtime = datetime.fromtimestamp(backup_file.stat().st_mtime)
-            if mtime < cutoff:
-                backup_file.unlink()
+        for entry in self._scan_backups():
+            if entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                self._fs_stats_cache = None
                 deleted += 1
-                logger.info(f"🗑️ Deleted old AI memory backup: {backup_file.name}")
+                logger.info(f"🗑️ Deleted old AI memory backup: {entry.name}")
         
         return {'deleted': deleted}
     
@@ -265,67 +475,74 @@ class AIMemoryManager:
     def add_pattern(self, pattern: Dict):
         """افزودن الگوی جدید"""
         with self.lock:
+            self._dirty.add('patterns')
             self.memories['patterns'].append({
                 **pattern,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': time.time_ns()
             })
-            # محدودیت اندازه
-            if len(self.memories['patterns']) > 10000:
-                self.memories['patterns'] = self.memories['patterns'][-10000:]
     
     def add_learning(self, learning: Dict):
         """افزودن یادگیری جدید"""
         with self.lock:
+            self._dirty.add('learnings')
             self.memories['learnings'].append({
                 **learning,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': time.time_ns()
             })
-            if len(self.memories['learnings']) > 10000:
-                self.memories['learnings'] = self.memories['learnings'][-10000:]
     
     def add_user_memory(self, user_id: int, key: str, value: Any):
         """ذخیره حافظه کاربر"""
         with self.lock:
-            if user_id not in self.memories['user_memories']:
-                self.memories['user_memories'][user_id] = {}
-            self.memories['user_memories'][user_id][key] = {
-                'value': value,
-                'timestamp': datetime.now().isoformat()
-            }
+            self._dirty.add('user_memories')
+            user_memories = self.memories['user_memories']
+            user_memories['value'][(user_id, key)] = value
+            user_memories['timestamp'][(user_id, key)] = time.time_ns()
+            
+            keys = user_memories['index'].get(user_id)
+            if keys is None:
+                keys = user_memories['index'][user_id] = set()
+            keys.add(key)
     
     def get_user_memory(self, user_id: int, key: str = None) -> Any:
         """دریافت حافظه کاربر"""
-        if user_id not in self.memories['user_memories']:
-            return None if key else {}
+        user_memories = self.memories['user_memories']
         
         if key:
-            data = self.memories['user_memories'][user_id].get(key)
-            return data['value'] if data else None
-        else:
-            return self.memories['user_memories'][user_id]
+            return user_memories['value'].get((user_id, key))
+        
+        keys = user_memories['index'].get(user_id)
+        if not keys:
+            return {}
+        return {
+            k: {'value': user_memories['value'][(user_id, k)],
+                'timestamp': _format_ts(user_memories['timestamp'][(user_id, k)])}
+            for k in keys
+        }
     
     def add_prediction(self, prediction: Dict):
         """ذخیره پیش‌بینی برای یادگیری آینده"""
         with self.lock:
+            self._dirty.add('predictions')
             self.memories['predictions'].append({
                 **prediction,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': time.time_ns()
             })
-            if len(self.memories['predictions']) > 10000:
-                self.memories['predictions'] = self.memories['predictions'][-10000:]
     
     def save_api_key(self, user_id: int, api_type: str, api_key: str):
-        """ذخیره API key (با encode)"""
+        """ذخیره API key (رمزشده با Fernet به صورت bytes؛ بدون cryptography فقط base64)"""
+        if self._cipher is not None:
+            encrypted = self._cipher.encrypt(api_key.encode())
+        else:
+            encrypted = base64.b64encode(api_key.encode()).decode()
+        
         with self.lock:
+            self._dirty.add('api_keys')
             if user_id not in self.memories['api_keys']:
                 self.memories['api_keys'][user_id] = {}
             
-            # encode ساده (در نسخه واقعی از encryption استفاده کن)
-            encoded = base64.b64encode(api_key.encode()).decode()
-            
             self.memories['api_keys'][user_id][api_type] = {
-                'key': encoded,
-                'timestamp': datetime.now().isoformat()
+                'key': encrypted,
+                'timestamp': time.time_ns()
             }
     
     def get_api_key(self, user_id: int, api_type: str) -> Optional[str]:
@@ -335,7 +552,12 @@ class AIMemoryManager:
         
         data = self.memories['api_keys'][user_id].get(api_type)
         if data:
-            # decode
+            if isinstance(data['key'], bytes):
+                if self._cipher is None:
+                    logger.error("❌ Encrypted API key found but cryptography is not installed")
+                    return None
+                return self._cipher.decrypt(data['key']).decode()
+            # کلیدهای قدیمی فقط base64 بودند
             return base64.b64decode(data['key'].encode()).decode()
         return None
     
@@ -347,13 +569,21 @@ class AIMemoryManager:
         return {
             'patterns': len(self.memories['patterns']),
             'learnings': len(self.memories['learnings']),
-            'users': len(self.memories['user_memories']),
+            'users': len(self.memories['user_memories']['index']),
             'predictions': len(self.memories['predictions']),
             'api_keys': sum(len(keys) for keys in self.memories['api_keys'].values()),
-            'backups': len(list(self.backup_dir.glob("*.pkl.gz"))),
-            'memory_size_mb': self._get_memory_size()
+            'backups': self._get_fs_stats()[1],
+            'memory_size_mb': self._get_fs_stats()[0]
         }
     
+    def _get_fs_stats(self) -> tuple:
+        """حجم حافظه و تعداد پشتیبان‌ها از کش (فقط بعد از تغییر فایل‌ها دوباره محاسبه می‌شود)"""
+        cached = self._fs_stats_cache
+        if cached is None:
+            cached = (self._get_memory_size(), len(list(self.backup_dir.glob("*.pkl.*"))))
+            self._fs_stats_cache = cached
+        return cached
+    
     def _get_memory_size(self) -> float:
         """محاسبه حجم حافظه"""
         total = 0
@@ -364,25 +594,91 @@ class AIMemoryManager:
     # ==================== پشتیبان‌گیری خودکار ====================
     
     def start_auto_save(self):
-        """شروع ذخیره و پشتیبان‌گیری خودکار"""
+        """
+        شروع ذخیره و پشتیبان‌گیری خودکار به صورت تسک‌های asyncio
+        داخل event loop ربات روی همان loop؛ در غیر این صورت در loop اختصاصی یک thread
+        """
         
-        def run_schedule():
+        if self._auto_save_tasks:
+            return
+        
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # ساخت sync (بدون event loop): همان تسک‌ها در thread جدا اجرا می‌شوند
+            loop = asyncio.new_event_loop()
+            self._auto_save_tasks = self._schedule_jobs(loop)
+            threading.Thread(target=self._run_private_loop, args=(loop, self._auto_save_tasks), daemon=True).start()
+        else:
+            self._auto_save_tasks = self._schedule_jobs(loop)
+        
+        logger.info(f"⏰ Auto-save scheduled every {self.auto_save_interval} minutes")
+    
+    def _schedule_jobs(self, loop: asyncio.AbstractEventLoop) -> List[asyncio.Task]:
+        """ساخت تسک‌های ذخیره و پشتیبان‌گیری روی loop داده‌شده"""
+        return [
             # ذخیره هر 60 دقیقه
-            schedule.every(self.auto_save_interval).minutes.do(self.save_memory)
+            loop.create_task(self._every(self.auto_save_interval * 60, self.save_memory)),
             
             # پشتیبان روزانه
-            schedule.every().day.at("02:00").do(self.create_backup)
+            loop.create_task(self._daily_at(2, self.create_backup)),
             
-            # پشتیبان هفتگی کامل
-            schedule.every().monday.at("03:00").do(self.create_backup, "weekly_backup")
+            # پشتیبان هفتگی کامل (دوشنبه)
+            loop.create_task(self._daily_at(3, self.create_backup, "weekly_backup", weekday=0)),
             
-            # پاک کردن پشتیبان‌های قدیمی هر هفته
-            schedule.every().sunday.at("04:00").do(self.cleanup_old_backups, keep_days=30)
+            # پاک کردن پشتیبان‌های قدیمی هر هفته (یکشنبه)
+            loop.create_task(self._daily_at(4, self.cleanup_old_backups, 30, weekday=6)),
+        ]
+    
+    @staticmethod
+    def _run_private_loop(loop: asyncio.AbstractEventLoop, tasks: List[asyncio.Task]):
+        """اجرای loop اختصاصی تا لغو همه تسک‌ها، سپس بستن آن"""
+        try:
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        finally:
+            loop.close()
+    
+    def stop_auto_save(self):
+        """
+        توقف تسک‌های ذخیره خودکار (از هر thread)
+        loopی که قبلاً بسته شده (مثلاً loop ربات هنگام atexit) نادیده گرفته می‌شود
+        """
+        tasks, self._auto_save_tasks = self._auto_save_tasks, []
+        for task in tasks:
+            try:
+                task.get_loop().call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                # Event loop is closed: تسک دیگر اجرا نمی‌شود
+                pass
+    
+    def close(self):
+        """توقف ذخیره خودکار، ذخیره تغییرات باقی‌مانده و انتظار برای نوشتن روی دیسک"""
+        try:
+            self.stop_auto_save()
+        finally:
+            self.save_memory()
+            self.flush()
+    
+    async def _every(self, interval: float, func, *args):
+        """اجرای دوره‌ای یک کار"""
+        while True:
+            await asyncio.sleep(interval)
+            await self._run_job(func, *args)
+    
+    async def _daily_at(self, hour: int, func, *args, weekday: int = None):
+        """اجرای روزانه (یا هفتگی با weekday) در ساعت مشخص"""
+        while True:
+            now = datetime.now()
+            next_run = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+            while next_run <= now or (weekday is not None and next_run.weekday() != weekday):
+                next_run += timedelta(days=1)
             
-            while True:
-                schedule.run_pending()
-                time.sleep(60)
-        
-        thread = threading.Thread(target=run_schedule, daemon=True)
-        thread.start()
-        logger.info(f"⏰ Auto-save scheduled every {self.auto_save_interval} minutes")
+            await asyncio.sleep((next_run - now).total_seconds())
+            await self._run_job(func, *args)
+    
+    async def _run_job(self, func, *args):
+        """اجرای کار blocking (pickle و فشرده‌سازی) در thread جدا"""
+        try:
+            await asyncio.to_thread(func, *args)
+        except Exception as e:
+            logger.error(f"❌ Scheduled memory job {func.__name__} failed: {e}")
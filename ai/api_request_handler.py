@@ -11,13 +11,26 @@
 import re
 import aiohttp
 import asyncio
-from typing import Dict, List, Optional, Any
+import time
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 import logging
 from enum import Enum
+from collections import deque
 
 logger = logging.getLogger(__name__)
 
+# الگوی استخراج API key از پیام کاربر: «نام: کلید» یا فقط کلید (یک پیمایش)
+_API_KEY_PATTERN = re.compile(
+    r'(?i)(?P<name>etherscan|bscscan|coingecko|newsapi|weather|football)[\s:=]+(?P<key>[A-Za-z0-9\-_]{10,})'
+    r'|(?P<bare>[A-Za-z0-9\-_]{20,})'
+)
+
+# کلمات کلیدی تشخیص نوع درخواست؛ هر گروه یک الگوی ترکیبی (یک پیمایش متن)
+_CRYPTO_KWS = re.compile('|'.join(map(re.escape, ['0x', 'token', 'coin', 'crypto'])))
+_SPORTS_KWS = re.compile('|'.join(map(re.escape, ['vs', 'match', 'game', 'football', 'soccer', 'basketball', 'tennis'])))
+_NEWS_KWS = re.compile('|'.join(map(re.escape, ['election', 'president', 'news', 'today', 'current', 'happening'])))
+
 class APIType(Enum):
     """انواع APIهای پشتیبانی شده"""
     COINGECKO = "coingecko"
@@ -32,11 +45,37 @@ class APIType(Enum):
     SPOTIFY = "spotify"
     CUSTOM = "custom"
 
+# فرمت شناخته‌شده کلید هر سرویس؛ کلید نامعتبر بدون درخواست شبکه رد می‌شود
+_KEY_FORMATS = {
+    APIType.ETHERSCAN: re.compile(r'[A-Za-z0-9]{34}'),
+    APIType.BSCSCAN: re.compile(r'[A-Za-z0-9]{34}'),
+    APIType.COINGECKO: re.compile(r'CG-[A-Za-z0-9]{20,}'),
+    APIType.NEWSAPI: re.compile(r'[0-9a-f]{32}'),
+    APIType.WEATHER: re.compile(r'[0-9a-f]{32}'),
+}
+
+# قالب‌های پیام درخواست API
+_API_REQUEST_HEAD = "🔑 **API Key Required**\n\n{description}\n\n"
+_API_REQUEST_ITEM = "{i}. **{name}**\n   📝 {description}\n   🔗 Get it here: {url}\n   {note}\n\n"
+_API_NOTE_OPTIONAL = "✨ (Optional - will improve accuracy)"
+_API_NOTE_REQUIRED = "⚠️ (Required for this query)"
+_API_REQUEST_FOOTER = (
+    "📤 **Send me the API key(s) in this format:**\n"
+    "`API_NAME: YOUR_API_KEY`\n\n"
+    "Example:\n"
+    "`ETHERSCAN: ABC123XYZ456`\n"
+    "`COINGECKO: DEF789UVW012`\n\n"
+    "Or send them one by one."
+)
+
 class APIRequestHandler:
     """
     مدیریت درخواست API key از کاربر
     """
     
+    # حداکثر زمان اعتبارسنجی هر کلید (ثانیه)
+    VALIDATION_TIMEOUT = 5
+    
     # تعریف APIهای مورد نیاز برای هر نوع درخواست
     API_REQUIREMENTS = {
         'crypto_address': {
@@ -100,8 +139,25 @@ class APIRequestHandler:
         # کش موقت API keyهای دریافتی (فقط برای session فعلی)
         self.temp_api_keys = {}
         
-        # تاریخچه درخواست‌ها
-        self.request_history = []
+        # تاریخچه درخواست‌ها (فقط 1000 رکورد آخر)
+        self.request_history = deque(maxlen=1000)
+        
+        # session مشترک HTTP برای همه اعتبارسنجی‌ها (ساخت تنبل)
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """session مشترک با connection pool و کش DNS"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=50, ttl_dns_cache=300)
+            )
+        return self._session
+    
+    async def close(self):
+        """بستن session مشترک هنگام خاموش شدن"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
     
     def detect_required_apis(self, query: str, query_type: str) -> List[Dict]:
         """
@@ -120,19 +176,18 @@ class APIRequestHandler:
         
         # تشخیص خودکار بر اساس محتوای query
         required_apis = []
+        query_lower = query.lower()
         
         # تشخیص نیاز به Crypto API
-        if any(addr in query for addr in ['0x', 'token', 'coin', 'crypto']):
+        if _CRYPTO_KWS.search(query):
             required_apis.extend(self.API_REQUIREMENTS['crypto_address']['apis'])
         
         # تشخیص نیاز به Sports API
-        sports_keywords = ['vs', 'match', 'game', 'football', 'soccer', 'basketball', 'tennis']
-        if any(kw in query.lower() for kw in sports_keywords):
+        if _SPORTS_KWS.search(query_lower):
             required_apis.extend(self.API_REQUIREMENTS['sports_match']['apis'])
         
         # تشخیص نیاز به News API
-        news_keywords = ['election', 'president', 'news', 'today', 'current', 'happening']
-        if any(kw in query.lower() for kw in news_keywords):
+        if _NEWS_KWS.search(query_lower):
             required_apis.extend(self.API_REQUIREMENTS['event_prediction']['apis'])
         
         return required_apis
@@ -145,27 +200,21 @@ class APIRequestHandler:
         if not required_apis:
             return ""
         
-        message = "🔑 **API Key Required**\n\n"
-        message += f"{self.API_REQUIREMENTS.get('description', 'To give you the most accurate prediction, I need:')}\n\n"
+        parts = [_API_REQUEST_HEAD.format(
+            description=self.API_REQUIREMENTS.get('description', 'To give you the most accurate prediction, I need:')
+        )]
         
         for i, api in enumerate(required_apis, 1):
-            message += f"{i}. **{api['name']}**\n"
-            message += f"   📝 {api['description']}\n"
-            message += f"   🔗 Get it here: {api['url']}\n"
-            if api.get('optional'):
-                message += "   ✨ (Optional - will improve accuracy)\n"
-            else:
-                message += "   ⚠️ (Required for this query)\n"
-            message += "\n"
+            parts.append(_API_REQUEST_ITEM.format(
+                i=i,
+                name=api['name'],
+                description=api['description'],
+                url=api['url'],
+                note=_API_NOTE_OPTIONAL if api.get('optional') else _API_NOTE_REQUIRED
+            ))
         
-        message += "📤 **Send me the API key(s) in this format:**\n"
-        message += "`API_NAME: YOUR_API_KEY`\n\n"
-        message += "Example:\n"
-        message += "`ETHERSCAN: ABC123XYZ456`\n"
-        message += "`COINGECKO: DEF789UVW012`\n\n"
-        message += "Or send them one by one."
-        
-        return message
+        parts.append(_API_REQUEST_FOOTER)
+        return "".join(parts)
     
     async def validate_api_key(self, api_type: APIType, api_key: str) -> Dict:
         """
@@ -175,6 +224,10 @@ class APIRequestHandler:
             {'valid': bool, 'message': str, 'details': dict}
         """
         
+        key_format = _KEY_FORMATS.get(api_type)
+        if key_format and not key_format.fullmatch(api_key.strip()):
+            return {'valid': False, 'message': '❌ Invalid API key format'}
+        
         try:
             if api_type == APIType.ETHERSCAN:
                 return await self._validate_etherscan(api_key)
@@ -197,107 +250,126 @@ class APIRequestHandler:
             logger.error(f"Error validating {api_type}: {e}")
             return {'valid': False, 'message': f'Validation error: {str(e)}'}
     
+    async def validate_many(self, items: List[Tuple[APIType, str]]) -> List[Dict]:
+        """
+        اعتبارسنجی هم‌زمان چند API key
+        زمان کل برابر کندترین درخواست است، نه مجموع آن‌ها
+        """
+        
+        results = await asyncio.gather(
+            *[asyncio.wait_for(self.validate_api_key(api_type, api_key), self.VALIDATION_TIMEOUT)
+              for api_type, api_key in items],
+            return_exceptions=True
+        )
+        
+        return [
+            {'valid': False, 'message': '❌ Validation timed out'} if isinstance(r, asyncio.TimeoutError)
+            else {'valid': False, 'message': f'Validation error: {str(r)}'} if isinstance(r, Exception)
+            else r
+            for r in results
+        ]
+    
     async def _validate_etherscan(self, api_key: str) -> Dict:
         """اعتبارسنجی Etherscan API"""
-        async with aiohttp.ClientSession() as session:
-            url = f"https://api.etherscan.io/api"
-            params = {
-                'module': 'account',
-                'action': 'balance',
-                'address': '0xde0b295669a9fd93d5f28d9ec85e40f4cb697bae',
-                'tag': 'latest',
-                'apikey': api_key
-            }
-            try:
-                async with session.get(url, params=params, timeout=5) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get('status') == '1':
-                            return {'valid': True, 'message': '✅ Etherscan API key is valid'}
-                        else:
-                            return {'valid': False, 'message': f"❌ Invalid key: {data.get('message', 'Unknown error')}"}
+        session = await self._get_session()
+        url = f"https://api.etherscan.io/api"
+        params = {
+            'module': 'account',
+            'action': 'balance',
+            'address': '0xde0b295669a9fd93d5f28d9ec85e40f4cb697bae',
+            'tag': 'latest',
+            'apikey': api_key
+        }
+        try:
+            async with session.get(url, params=params, timeout=5) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    if data.get('status') == '1':
+                        return {'valid': True, 'message': '✅ Etherscan API key is valid'}
                     else:
-                        return {'valid': False, 'message': f"❌ HTTP {response.status}"}
-            except Exception as e:
-                return {'valid': False, 'message': f"❌ Connection error: {str(e)}"}
+                        return {'valid': False, 'message': f"❌ Invalid key: {data.get('message', 'Unknown error')}"}
+                else:
+                    return {'valid': False, 'message': f"❌ HTTP {response.status}"}
+        except Exception as e:
+            return {'valid': False, 'message': f"❌ Connection error: {str(e)}"}
     
     async def _validate_coingecko(self, api_key: str) -> Dict:
         """اعتبارسنجی CoinGecko API"""
-        async with aiohttp.ClientSession() as session:
-            url = "https://api.coingecko.com/api/v3/ping"
-            headers = {'x-cg-pro-api-key': api_key}
-            try:
-                async with session.get(url, headers=headers, timeout=5) as response:
-                    if response.status == 200:
-                        return {'valid': True, 'message': '✅ CoinGecko API key is valid'}
-                    elif response.status == 401:
-                        return {'valid': False, 'message': '❌ Invalid API key'}
-                    else:
-                        return {'valid': False, 'message': f"❌ HTTP {response.status}"}
-            except Exception as e:
-                return {'valid': False, 'message': f"❌ Connection error: {str(e)}"}
+        session = await self._get_session()
+        url = "https://api.coingecko.com/api/v3/ping"
+        headers = {'x-cg-pro-api-key': api_key}
+        try:
+            async with session.get(url, headers=headers, timeout=5) as response:
+                if response.status == 200:
+                    return {'valid': True, 'message': '✅ CoinGecko API key is valid'}
+                elif response.status == 401:
+                    return {'valid': False, 'message': '❌ Invalid API key'}
+                else:
+                    return {'valid': False, 'message': f"❌ HTTP {response.status}"}
+        except Exception as e:
+            return {'valid': False, 'message': f"❌ Connection error: {str(e)}"}
     
     async def _validate_newsapi(self, api_key: str) -> Dict:
         """اعتبارسنجی NewsAPI"""
-        async with aiohttp.ClientSession() as session:
-            url = "https://newsapi.org/v2/top-headlines"
-            params = {
-                'country': 'us',
-                'apiKey': api_key
-            }
-            try:
-                async with session.get(url, params=params, timeout=5) as response:
-                    if response.status == 200:
-                        return {'valid': True, 'message': '✅ NewsAPI key is valid'}
-                    elif response.status == 401:
-                        return {'valid': False, 'message': '❌ Invalid API key'}
-                    else:
-                        return {'valid': False, 'message': f"❌ HTTP {response.status}"}
-            except Exception as e:
-                return {'valid': False, 'message': f"❌ Connection error: {str(e)}"}
+        session = await self._get_session()
+        url = "https://newsapi.org/v2/top-headlines"
+        params = {
+            'country': 'us',
+            'apiKey': api_key
+        }
+        try:
+            async with session.get(url, params=params, timeout=5) as response:
+                if response.status == 200:
+                    return {'valid': True, 'message': '✅ NewsAPI key is valid'}
+                elif response.status == 401:
+                    return {'valid': False, 'message': '❌ Invalid API key'}
+                else:
+                    return {'valid': False, 'message': f"❌ HTTP {response.status}"}
+        except Exception as e:
+            return {'valid': False, 'message': f"❌ Connection error: {str(e)}"}
     
     async def _validate_weather(self, api_key: str) -> Dict:
         """اعتبارسنجی OpenWeatherMap API"""
-        async with aiohttp.ClientSession() as session:
-            url = "http://api.openweathermap.org/data/2.5/weather"
-            params = {
-                'q': 'London',
-                'appid': api_key
-            }
-            try:
-                async with session.get(url, params=params, timeout=5) as response:
-                    if response.status == 200:
-                        return {'valid': True, 'message': '✅ Weather API key is valid'}
-                    elif response.status == 401:
-                        return {'valid': False, 'message': '❌ Invalid API key'}
-                    else:
-                        return {'valid': False, 'message': f"❌ HTTP {response.status}"}
-            except Exception as e:
-                return {'valid': False, 'message': f"❌ Connection error: {str(e)}"}
+        session = await self._get_session()
+        url = "http://api.openweathermap.org/data/2.5/weather"
+        params = {
+            'q': 'London',
+            'appid': api_key
+        }
+        try:
+            async with session.get(url, params=params, timeout=5) as response:
+                if response.status == 200:
+                    return {'valid': True, 'message': '✅ Weather API key is valid'}
+                elif response.status == 401:
+                    return {'valid': False, 'message': '❌ Invalid API key'}
+                else:
+                    return {'valid': False, 'message': f"❌ HTTP {response.status}"}
+        except Exception as e:
+            return {'valid': False, 'message': f"❌ Connection error: {str(e)}"}
     
     async def _validate_bscscan(self, api_key: str) -> Dict:
         """اعتبارسنجی BSCscan API"""
-        async with aiohttp.ClientSession() as session:
-            url = "https://api.bscscan.com/api"
-            params = {
-                'module': 'account',
-                'action': 'balance',
-                'address': '0xb5d4f343412dc8efb6ff599d790074d0f1e8d430',
-                'tag': 'latest',
-                'apikey': api_key
-            }
-            try:
-                async with session.get(url, params=params, timeout=5) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get('status') == '1':
-                            return {'valid': True, 'message': '✅ BSCscan API key is valid'}
-                        else:
-                            return {'valid': False, 'message': f"❌ Invalid key: {data.get('message', 'Unknown error')}"}
+        session = await self._get_session()
+        url = "https://api.bscscan.com/api"
+        params = {
+            'module': 'account',
+            'action': 'balance',
+            'address': '0xb5d4f343412dc8efb6ff599d790074d0f1e8d430',
+            'tag': 'latest',
+            'apikey': api_key
+        }
+        try:
+            async with session.get(url, params=params, timeout=5) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    if data.get('status') == '1':
+                        return {'valid': True, 'message': '✅ BSCscan API key is valid'}
                     else:
-                        return {'valid': False, 'message': f"❌ HTTP {response.status}"}
-            except Exception as e:
-                return {'valid': False, 'message': f"❌ Connection error: {str(e)}"}
+                        return {'valid': False, 'message': f"❌ Invalid key: {data.get('message', 'Unknown error')}"}
+                else:
+                    return {'valid': False, 'message': f"❌ HTTP {response.status}"}
+        except Exception as e:
+            return {'valid': False, 'message': f"❌ Connection error: {str(e)}"}
     
     def parse_api_message(self, message: str) -> Dict[str, str]:
         """
@@ -307,25 +379,15 @@ class APIRequestHandler:
         """
         api_keys = {}
         
-        # الگوهای مختلف
-        patterns = [
-            r'(?i)(etherscan|bscscan|coingecko|newsapi|weather|football)[\s:=]+([A-Za-z0-9\-_]{10,})',
-            r'(?i)api[_\s]*(?:key)?[\s:=]+([A-Za-z0-9\-_]{10,})',
-            r'(?i)([A-Za-z0-9\-_]{20,})'  # اگر فقط کلید رو فرستاد
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, message)
-            for match in matches:
-                if isinstance(match, tuple) and len(match) == 2:
-                    api_name, api_key = match
-                    api_keys[api_name.upper()] = api_key
-                elif isinstance(match, str) and len(match) > 20:
-                    # اگر فقط کلید بود، به عنوان آخرین API در نظر می‌گیریم
-                    if 'last_api' in api_keys:
-                        api_keys['CUSTOM'] = match
-                    else:
-                        api_keys['last_api'] = match
+        for match in _API_KEY_PATTERN.finditer(message):
+            if match.group('name'):
+                api_keys[match.group('name').upper()] = match.group('key')
+            elif len(match.group('bare')) > 20:
+                # اگر فقط کلید بود، به عنوان آخرین API در نظر می‌گیریم
+                if 'last_api' in api_keys:
+                    api_keys['CUSTOM'] = match.group('bare')
+                else:
+                    api_keys['last_api'] = match.group('bare')
         
         return api_keys
     
@@ -371,9 +433,5 @@ class APIRequestHandler:
             'user_id': user_id,
             'query': query[:100],
             'apis': apis_requested,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': time.time_ns()
         })
-        
-        # نگه داشتن فقط 1000 رکورد آخر
-        if len(self.request_history) > 1000:
-            self.request_history = self.request_history[-1000:]
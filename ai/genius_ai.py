@@ -5,62 +5,156 @@
 نسخه ساده شده genius_ai بدون وابستگی به کتابخونه‌های سنگین
 """
 
+import sys
 import logging
-from typing import Dict, Any
+import asyncio
+from functools import lru_cache
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping
 
 logger = logging.getLogger(__name__)
 
+# رشته‌های ثابت نتیجه؛ intern می‌شوند تا همه نتیجه‌ها همین اشیاء را به اشتراک بگذارند
+_CONF_LOW = sys.intern('⚠️ Low Confidence')
+_REC_CLOSE = sys.intern('🤔 Too close to call')
+_INTERP_INIT = sys.intern('Analysis in progress...')
+
+# قالب نتیجه پیش‌بینی؛ یک بار ساخته می‌شود و هر نتیجه کپی سطحی آن است
+# ensemble_details, ml_component, memory_component و numerology_component پیش‌فرض
+# دیکشنری‌های مشترک هستند: فقط‌خواندنی، برای تغییر باید دیکشنری جدید جایگزین شود
+_RESULT_TEMPLATE: Dict[str, Any] = {
+    'value': 0.5,
+    'probability': 0.5,
+    'confidence': 0.5,
+    'confidence_level': _CONF_LOW,
+    'recommendation': _REC_CLOSE,
+    'interpretation': _INTERP_INIT,
+    'ensemble_details': {},
+    'numerology_component': {},
+    'ml_component': {},
+    'memory_component': {},
+    'timestamp': None  # هر نتیجه زمان واقعی خودش را می‌گیرد
+}
+
+# آمار ثابت نسخه ساده؛ نمای فقط‌خواندنی مشترک
+_STATS = MappingProxyType({
+    'total_predictions': 0,
+    'accuracy': '0%',
+    'learned_patterns': 0,
+    'active_models': 1,
+    'memory_size': 0,
+    'pattern_memory': 0
+})
+
 class GeniusAI:
     """نسخه ساده شده هوش مصنوعی"""
     
+    # زیرکلاس‌ها باید __slots__ (یا __dict__) خودشان را تعریف کنند
+    __slots__ = ('db', 'numerology', '_numerology_cache', '_dispatch')
+    
     def __init__(self, db_session=None, numerology_engine=None):
         self.db = db_session
         self.numerology = numerology_engine
+        
+        # تحلیل عددشناسی آدرس قطعی است؛ نتیجه‌ها بر اساس آدرس کش می‌شوند (فقط‌خواندنی)
+        self._numerology_cache = (
+            lru_cache(maxsize=4096)(numerology_engine.analyze_token_address)
+            if numerology_engine else None
+        )
+        
+        # جدول پیش‌بینی بر اساس نوع؛ هر تابع فقط فیلدهای خودش را برمی‌گرداند
+        self._dispatch = {
+            'general': self._predict_timed,
+            'crypto': self._predict_token,
+            'token': self._predict_token,
+            'sports': self._predict_timed,
+            'event': self._predict_timed
+        }
         logger.info("🧠 GeniusAI (ساده شده) راه‌اندازی شد")
     
-    async def predict(self, input_data: Dict, prediction_type: str = 'general') -> Dict[str, Any]:
-        """پیش‌بینی ساده"""
-        logger.info(f"📊 پیش‌بینی از نوع: {prediction_type}")
+    def predict(self, input_data: Dict, prediction_type: str = 'general') -> Dict[str, Any]:
+        """
+        پیش‌بینی ساده (بدون await؛ کار CPU است)
+        برای اجرا خارج از event loop: await asyncio.to_thread(ai.predict, ...)
+        """
+        logger.info("📊 پیش‌بینی از نوع: %s", prediction_type)
         
-        result = {
-            'value': 0.5,
-            'probability': 0.5,
-            'confidence': 0.5,
-            'confidence_level': '⚠️ Low Confidence',
-            'recommendation': '🤔 Too close to call',
-            'interpretation': 'Analysis in progress...',
-            'ensemble_details': {},
-            'numerology_component': {},
-            'ml_component': {},
-            'memory_component': {},
-            'timestamp': '2024-01-01T00:00:00'
-        }
+        handler = self._dispatch.get(prediction_type, self._predict_timed)
+        result = _RESULT_TEMPLATE.copy()
+        result.update(handler(input_data))
+        return result
+    
+    def _predict_timed(self, input_data: Dict) -> Dict[str, Any]:
+        """پیش‌بینی عمومی/ورزشی/رویداد: فقط زمان واقعی"""
+        return {'timestamp': datetime.now(timezone.utc).isoformat()}
+    
+    def _predict_token(self, input_data: Dict) -> Dict[str, Any]:
+        """پیش‌بینی توکن: زمان واقعی + عددشناسی آدرس"""
+        fields = self._predict_timed(input_data)
         
         # اگه عددشناسی وجود داشت، ازش استفاده کن
-        if self.numerology:
+        address = input_data.get('token_address')
+        if self.numerology and address:
             try:
-                if 'token_address' in input_data:
-                    num_result = self.numerology.analyze_token_address(input_data['token_address'])
-                    if num_result:
-                        result['numerology_component'] = num_result
-                        result['value'] = num_result.get('numerological_score', 50) / 100
-            except:
-                pass
+                fields.update(self._numerology_fields(self._numerology_cache(address)))
+            except (AttributeError, ValueError, TypeError) as e:
+                logger.debug("numerology failed: %s", e)
         
-        return result
+        return fields
     
-    async def learn_from_experience(self, prediction_data: Dict, actual_outcome: Any):
-        """یادگیری از تجربیات (غیرفعال)"""
-        logger.info("📝 یادگیری از تجربیات (غیرفعال)")
-        pass
+    async def predict_batch(self, inputs: List[Dict], prediction_type: str = 'general') -> List[Dict[str, Any]]:
+        """
+        پیش‌بینی دسته‌ای با همان جدول نوع‌ها که predict استفاده می‌کند
+        برای نوع‌های توکن، تحلیل‌های عددشناسی هم‌زمان اجرا می‌شوند
+        """
+        logger.info("📊 پیش‌بینی از نوع: %s (%d مورد)", prediction_type, len(inputs))
+        
+        handler = self._dispatch.get(prediction_type, self._predict_timed)
+        if handler != self._predict_token or not self.numerology:
+            return [{**_RESULT_TEMPLATE, **handler(data)} for data in inputs]
+        
+        # فیلدهای غیر عددشناسی همان _predict_token؛ عددشناسی پایین‌تر موازی
+        results = [{**_RESULT_TEMPLATE, **self._predict_timed(data)} for data in inputs]
+        
+        indexed = [(i, data.get('token_address')) for i, data in enumerate(inputs) if data.get('token_address')]
+        num_results = await asyncio.gather(
+            *[asyncio.to_thread(self._numerology_cache, address) for _, address in indexed],
+            return_exceptions=True
+        )
+        
+        for (i, _), num_result in zip(indexed, num_results):
+            # فقط خطاهای قابل انتظار از ورودی بد نادیده گرفته می‌شوند
+            if isinstance(num_result, (AttributeError, ValueError, TypeError)):
+                logger.debug("numerology failed: %s", num_result)
+                continue
+            if isinstance(num_result, BaseException):
+                raise num_result
+            
+            results[i].update(self._numerology_fields(num_result))
+        
+        return results
     
-    def get_stats(self) -> Dict[str, Any]:
-        """گرفتن آمار"""
+    @staticmethod
+    def _numerology_fields(num_result: Dict) -> Dict[str, Any]:
+        """فیلدهای نتیجه پیش‌بینی از روی نتیجه عددشناسی"""
+        if not num_result:
+            return {}
         return {
-            'total_predictions': 0,
-            'accuracy': '0%',
-            'learned_patterns': 0,
-            'active_models': 1,
-            'memory_size': 0,
-            'pattern_memory': 0
+            'numerology_component': num_result,
+            # نتیجه‌های قدیمی فقط numerological_score (0-100) دارند
+            'value': num_result.get('numerological_score_01') or num_result.get('numerological_score', 50) / 100
         }
+    
+    @staticmethod
+    def learn_from_experience(prediction_data: Dict, actual_outcome: Any):
+        """یادگیری از تجربیات (غیرفعال؛ بدون کار)"""
+        pass
+    
+    def get_stats(self) -> Mapping[str, Any]:
+        """گرفتن آمار (فقط‌خواندنی؛ برای نسخه قابل تغییر get_stats_copy)"""
+        return _STATS
+    
+    def get_stats_copy(self) -> Dict[str, Any]:
+        """کپی قابل تغییر از آمار"""
+        return dict(_STATS)
@@ -13,17 +13,224 @@ from telegram.ext import (
     ConversationHandler
 )
 from telegram.constants import ParseMode
-from datetime import datetime
+from telegram.request import HTTPXRequest
+from telegram.error import BadRequest
+
+# uvloop اختیاری است (event loop سریع‌تر روی لینوکس)
+try:
+    import uvloop
+    HAS_UVLOOP = True
+except ImportError:
+    HAS_UVLOOP = False
+
+# محدودکننده نرخ ارسال اختیاری است (python-telegram-bot[rate-limiter])
+try:
+    import aiolimiter  # noqa: F401
+    from telegram.ext import AIORateLimiter
+    HAS_RATE_LIMITER = True
+except ImportError:
+    HAS_RATE_LIMITER = False
+from datetime import date
+from typing import Tuple
 import asyncio
 import json
-import threading
+import secrets
+import signal
+import aiohttp
+from aiohttp import web
 
 # ===== ایمپورت‌های ایمن =====
 from core.safe_imports import importer
 from core.error_handler import error_handler, safe_execute, safe_async_execute
+from utils.markdown import escape_markdown
 
 logger = logging.getLogger(__name__)
 
+# فاصله بازسازی تجمیع درآمد و به‌روزرسانی آمار ANALYZE (ثانیه)
+REVENUE_REFRESH_INTERVAL = 300
+ANALYZE_INTERVAL = 24 * 3600
+
+# ===== منوهای ثابت؛ یک بار ساخته می‌شوند =====
+_MAIN_MENU = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🔮 Crypto", callback_data='menu_crypto'),
+        InlineKeyboardButton("⚽ Sports", callback_data='menu_sports')
+    ],
+    [
+        InlineKeyboardButton("🌍 Events", callback_data='menu_events'),
+        InlineKeyboardButton("🔢 Numerology", callback_data='menu_numerology')
+    ],
+    [
+        InlineKeyboardButton("💰 Wallet", callback_data='menu_wallet'),
+        InlineKeyboardButton("📊 Profile", callback_data='menu_profile')
+    ],
+    [
+        InlineKeyboardButton("📚 Knowledge", callback_data='menu_knowledge'),
+        InlineKeyboardButton("❓ Help", callback_data='menu_help')
+    ]
+])
+
+_CRYPTO_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔍 Analyze Token", callback_data='crypto_analyze')],
+    [InlineKeyboardButton("🚀 Pump Prediction", callback_data='crypto_pump')],
+    [InlineKeyboardButton("🔙 Back", callback_data='back_main')]
+])
+
+_NUMEROLOGY_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📅 Life Path", callback_data='num_life_path')],
+    [InlineKeyboardButton("📝 Name Number", callback_data='num_name')],
+    [InlineKeyboardButton("❤️ Compatibility", callback_data='num_compatibility')],
+    [InlineKeyboardButton("🔙 Back", callback_data='back_main')]
+])
+
+_WALLET_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📥 Deposit", callback_data='wallet_deposit')],
+    [InlineKeyboardButton("🔙 Back", callback_data='back_main')]
+])
+
+_BACK_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔙 Back", callback_data='back_main')]
+])
+
+# ===== صفحه‌های ثابت (متن، کیبورد)؛ یک بار ساخته می‌شوند =====
+_NUMEROLOGY_TEXT = """
+🔢 **Numerology**
+Status: ✅ Always Active
+
+**Available calculations:**
+• Life Path Number
+• Name Number
+• Personal Day
+• Gematria
+• Compatibility
+"""
+
+_WALLET_TEXT = """
+💰 **Wallet**
+Status: Processing...
+
+• Balance: $0.00
+• Total predictions: 0
+• Success rate: 0%
+
+**Note:** Payment system initializing.
+"""
+
+_KNOWLEDGE_TEXT = """
+📚 **Knowledge Base**
+
+**Number Meanings:**
+1️⃣ Leadership, independence
+2️⃣ Cooperation, diplomacy
+3️⃣ Creativity, expression
+4️⃣ Stability, discipline
+5️⃣ Freedom, adventure
+6️⃣ Responsibility, love
+7️⃣ Wisdom, analysis
+8️⃣ Power, success
+9️⃣ Humanitarianism
+
+**Sources:**
+• Numbers: Their Occult Power
+• Kabala of Numbers
+• Three Books of Occult Philosophy
+"""
+
+_HELP_TEXT = """
+❓ **Help & Support**
+
+**Commands:**
+/start - Main menu
+/balance - Check balance
+/profile - Your profile
+/help - This menu
+
+**Features:**
+• All features work even with limited libraries
+• Self-healing system active
+• Automatic error recovery
+• Continuous evolution
+
+**Support:**
+@UltimateOracleBot
+"""
+
+# پیام خوش‌آمد: سر + نام کاربر + دم (وضعیت ماژول‌ها یک بار در __init__ پر می‌شود)
+_WELCOME_HEAD = "\n✨ **Welcome "
+_WELCOME_TAIL = """!** ✨
+
+I'm an intelligent bot with self-healing capabilities.
+All features work even if some libraries are missing.
+
+**Available features:**
+• 🔮 Crypto predictions {crypto}
+• ⚽ Sports predictions {sports}
+• 🌍 Event predictions {events}
+• 🔢 Numerology calculations ✅
+• 💰 Wallet & payments {wallet}
+"""
+
+# صفحه‌های وابسته به وضعیت ماژول‌ها؛ وضعیت یک بار در __init__ پر می‌شود
+_CRYPTO_TEMPLATE = """
+🔮 **Crypto Predictions**
+Status: {status}
+
+**Available options:**
+• Analyze token by address
+• Pump prediction
+• Market overview
+• Whale alerts
+
+**Note:** Basic analysis always works.
+        """
+
+_SPORTS_TEMPLATE = """
+⚽ **Sports Predictions**
+Status: {status}
+
+**Available sports:**
+• Football
+• Basketball
+• Tennis
+• And more...
+
+**Note:** Basic predictions available even without ML.
+        """
+
+_EVENTS_TEMPLATE = """
+🌍 **Event Predictions**
+Status: {status}
+
+**Available events:**
+• Elections
+• Weather
+• Awards
+• Custom events
+        """
+
+# پروفایل: وضعیت ماژول‌ها در __init__ و فقط {{user_id}}/{{joined}} در هر درخواست
+_PROFILE_TEMPLATE = """
+📊 **Your Profile**
+
+🆔 ID: `{{user_id}}`
+📅 Joined: {{joined}}
+
+**Active Features:**
+• Numerology: ✅
+• Crypto: {crypto}
+• Sports: {sports}
+• Events: {events}
+• Wallet: {wallet}
+        """
+
+_STATIC_SCREENS = {
+    'menu_numerology': (_NUMEROLOGY_TEXT, _NUMEROLOGY_MENU),
+    'menu_wallet': (_WALLET_TEXT, _WALLET_MENU),
+    'menu_knowledge': (_KNOWLEDGE_TEXT, _BACK_MENU),
+    'menu_help': (_HELP_TEXT, _BACK_MENU),
+    'back_main': ("✨ **Main Menu** ✨", _MAIN_MENU)
+}
+
 class UltimateBot:
     """
     ربات اصلی با imports ایمن
@@ -33,10 +240,14 @@ class UltimateBot:
         logger.info("🤖 Initializing UltimateBot...")
         
         # ===== ایمپورت‌های ایمن =====
-        from database.models import init_database, User, Prediction, get_db
+        from database.models import User, Prediction, get_db, AsyncSessionLocal, refresh_revenue_aggregates, analyze_database
         from core.numerology_engine import NumerologyEngine
         
+        # سشن مشترک فقط برای سازنده تحلیلگرها؛ هندلرها از self.Session سشن جدا می‌گیرند
+        # هشدار: با concurrent_updates هندلرها هم‌زمان اجرا می‌شوند و Session همزمانی را تحمل نمی‌کند؛
+        # self.db (و کدی از تحلیلگرها/پنل که از آن کوئری می‌گیرد) نباید از مسیر هندلرها صدا زده شود
         self.db = next(get_db())
+        self.Session = AsyncSessionLocal
         self.numerology = NumerologyEngine(self.db)
         
         # ===== AI و تحلیلگرها (با fallback) =====
@@ -45,6 +256,15 @@ class UltimateBot:
         self.sports_predictor = None
         self.event_predictor = None
         self.payment_verifier = None
+        self.admin_panel = None
+        
+        # session مشترک HTTP؛ در post_init (داخل event loop) ساخته می‌شود
+        self.http = None
+        
+        # تسک نگهداری دوره‌ای دیتابیس؛ در post_init شروع می‌شود
+        self._refresh_revenue = refresh_revenue_aggregates
+        self._analyze_database = analyze_database
+        self._maintenance_task = None
         
         # تلاش برای import AI
         try:
@@ -86,73 +306,114 @@ class UltimateBot:
         except ImportError as e:
             logger.warning(f"⚠️ PaymentVerifier not available: {e}")
         
-        # ===== Webhook server =====
-        self.webhook_server = None
-        self.start_webhook_server()
-    
-    def start_webhook_server(self):
-        """راه‌اندازی سرور webhook در thread جدا"""
+        # تلاش برای import Admin Panel
         try:
-            webhook_thread = threading.Thread(target=self._run_webhook_server, daemon=True)
-            webhook_thread.start()
-            logger.info("✅ Webhook server thread started")
-        except Exception as e:
-            logger.error(f"❌ Failed to start webhook server: {e}")
+            from admin.admin_panel import AdminPanel
+            self.admin_panel = AdminPanel(self.db)
+            logger.info("✅ AdminPanel loaded")
+        except ImportError as e:
+            logger.warning(f"⚠️ AdminPanel not available: {e}")
+        
+        # وضعیت ماژول‌ها بعد از بارگذاری ثابت است
+        self._status = {
+            'crypto': self._get_status_emoji(self.token_analyzer),
+            'sports': self._get_status_emoji(self.sports_predictor),
+            'events': self._get_status_emoji(self.event_predictor),
+            'wallet': self._get_status_emoji(self.payment_verifier)
+        }
+        self._welcome_tail = _WELCOME_TAIL.format(**self._status)
+        self._profile_template = _PROFILE_TEMPLATE.format(**self._status)
+        
+        # همه صفحه‌های بدون متغیر کاربر (متن، کیبورد)؛ ثابت‌ها + صفحه‌های وابسته به وضعیت
+        self._screens = {
+            **_STATIC_SCREENS,
+            'menu_crypto': (
+                _CRYPTO_TEMPLATE.format(status="✅ Active" if self.token_analyzer else "⏳ Limited (basic only)"),
+                _CRYPTO_MENU
+            ),
+            'menu_sports': (
+                _SPORTS_TEMPLATE.format(status="✅ Active" if self.sports_predictor else "⏳ Limited"),
+                _BACK_MENU
+            ),
+            'menu_events': (
+                _EVENTS_TEMPLATE.format(status="✅ Active" if self.event_predictor else "⏳ Limited"),
+                _BACK_MENU
+            )
+        }
+        
+        # ===== جدول مسیریابی دکمه‌ها (callback_data -> handler) =====
+        self._routes = {
+            'menu_crypto': self._show_static,
+            'menu_sports': self._show_static,
+            'menu_events': self._show_static,
+            'menu_numerology': self._show_static,
+            'menu_wallet': self._show_static,
+            'menu_profile': self._show_profile,
+            'menu_knowledge': self._show_static,
+            'menu_help': self._show_static,
+            'back_main': self._go_main
+        }
     
-    def _run_webhook_server(self):
-        """اجرای سرور webhook"""
-        import asyncio
-        from aiohttp import web
+    async def _post_init(self, app: Application):
+        """ساخت session مشترک HTTP و تزریق به تحلیلگرها"""
+        self.http = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, limit_per_host=20, ttl_dns_cache=300, keepalive_timeout=60)
+        )
+        for engine in (self.sports_predictor, self.event_predictor):
+            if engine:
+                engine.http = self.http
+        logger.info("✅ Shared HTTP session ready")
+        
+        self._maintenance_task = asyncio.create_task(self._maintenance_loop())
         
-        async def webhook_handler(request):
+        if self.admin_panel:
+            self.admin_panel.start_system_sampler()
+    
+    async def _maintenance_loop(self):
+        """
+        نگهداری دوره‌ای دیتابیس:
+        - بازسازی تجمیع درآمد (triggerها برگشت وضعیت و حذف را نمی‌بینند)
+        - ANALYZE روزانه تا approx_count به COUNT(*) کامل برنگردد
+        """
+        loop = asyncio.get_running_loop()
+        last_analyze = loop.time()  # init_database هنگام شروع ANALYZE کرده
+        
+        while True:
+            await asyncio.sleep(REVENUE_REFRESH_INTERVAL)
             try:
-                data = await request.json()
-                # پردازش webhook
-                return web.Response(text='OK')
+                since = await asyncio.to_thread(self._refresh_revenue)
+                logger.debug("📊 Revenue rollups refreshed since %s", since)
             except Exception as e:
-                logger.error(f"Webhook error: {e}")
-                return web.Response(text='Error', status=500)
-        
-        async def run_server():
-            app = web.Application()
-            app.router.add_post('/webhook', webhook_handler)
+                logger.error("❌ Revenue rollup failed: %s", e)
             
-            runner = web.AppRunner(app)
-            await runner.setup()
-            site = web.TCPSite(runner, '0.0.0.0', 8080)
-            await site.start()
-            logger.info("✅ Webhook server running on port 8080")
-            
-            # نگه داشتن سرور فعال
-            while True:
-                await asyncio.sleep(3600)
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(run_server())
-        loop.run_forever()
+            if loop.time() - last_analyze >= ANALYZE_INTERVAL:
+                try:
+                    await asyncio.to_thread(self._analyze_database)
+                    last_analyze = loop.time()
+                    logger.info("📈 Database statistics updated")
+                except Exception as e:
+                    logger.error("❌ ANALYZE failed: %s", e)
+    
+    async def shutdown(self, app: Application = None):
+        """توقف تسک‌های پس‌زمینه و بستن session مشترک HTTP"""
+        if self.admin_panel:
+            self.admin_panel.stop_system_sampler()
+        
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            self._maintenance_task = None
+        
+        for engine in (self.sports_predictor, self.event_predictor):
+            if engine:
+                await engine.close()
+        
+        if self.http is not None and not self.http.closed:
+            await self.http.close()
+        self.http = None
     
     def get_main_menu(self) -> InlineKeyboardMarkup:
         """منوی اصلی"""
-        buttons = [
-            [
-                InlineKeyboardButton("🔮 Crypto", callback_data='menu_crypto'),
-                InlineKeyboardButton("⚽ Sports", callback_data='menu_sports')
-            ],
-            [
-                InlineKeyboardButton("🌍 Events", callback_data='menu_events'),
-                InlineKeyboardButton("🔢 Numerology", callback_data='menu_numerology')
-            ],
-            [
-                InlineKeyboardButton("💰 Wallet", callback_data='menu_wallet'),
-                InlineKeyboardButton("📊 Profile", callback_data='menu_profile')
-            ],
-            [
-                InlineKeyboardButton("📚 Knowledge", callback_data='menu_knowledge'),
-                InlineKeyboardButton("❓ Help", callback_data='menu_help')
-            ]
-        ]
-        return InlineKeyboardMarkup(buttons)
+        return _MAIN_MENU
     
     @safe_async_execute(default_return=None)
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -160,19 +421,8 @@ class UltimateBot:
         user = update.effective_user
         logger.info(f"User {user.id} started the bot")
         
-        welcome_text = f"""
-✨ **Welcome {user.first_name}!** ✨
-
-I'm an intelligent bot with self-healing capabilities.
-All features work even if some libraries are missing.
-
-**Available features:**
-• 🔮 Crypto predictions {self._get_status_emoji(self.token_analyzer)}
-• ⚽ Sports predictions {self._get_status_emoji(self.sports_predictor)}
-• 🌍 Event predictions {self._get_status_emoji(self.event_predictor)}
-• 🔢 Numerology calculations ✅
-• 💰 Wallet & payments {self._get_status_emoji(self.payment_verifier)}
-        """
+        # فقط نام کاربر متغیر است؛ بقیه متن در __init__ ساخته شده
+        welcome_text = _WELCOME_HEAD + escape_markdown(user.first_name) + self._welcome_tail
         
         await update.message.reply_text(
             welcome_text,
@@ -190,253 +440,38 @@ All features work even if some libraries are missing.
         query = update.callback_query
         await query.answer()
         
-        data = query.data
-        
-        if data == 'menu_crypto':
-            await self._show_crypto_menu(query)
-        elif data == 'menu_sports':
-            await self._show_sports_menu(query)
-        elif data == 'menu_events':
-            await self._show_events_menu(query)
-        elif data == 'menu_numerology':
-            await self._show_numerology_menu(query)
-        elif data == 'menu_wallet':
-            await self._show_wallet(query)
-        elif data == 'menu_profile':
-            await self._show_profile(query)
-        elif data == 'menu_knowledge':
-            await self._show_knowledge(query)
-        elif data == 'menu_help':
-            await self._show_help(query)
-        elif data == 'back_main':
-            await query.edit_message_text(
-                "✨ **Main Menu** ✨",
-                reply_markup=self.get_main_menu(),
-                parse_mode=ParseMode.MARKDOWN
-            )
-    
-    async def _show_crypto_menu(self, query):
-        """منوی کریپتو"""
-        status = "✅ Active" if self.token_analyzer else "⏳ Limited (basic only)"
-        
-        text = f"""
-🔮 **Crypto Predictions**
-Status: {status}
-
-**Available options:**
-• Analyze token by address
-• Pump prediction
-• Market overview
-• Whale alerts
-
-**Note:** Basic analysis always works.
-        """
-        
-        buttons = [
-            [InlineKeyboardButton("🔍 Analyze Token", callback_data='crypto_analyze')],
-            [InlineKeyboardButton("🚀 Pump Prediction", callback_data='crypto_pump')],
-            [InlineKeyboardButton("🔙 Back", callback_data='back_main')]
-        ]
-        
-        await query.edit_message_text(
-            text,
-            reply_markup=InlineKeyboardMarkup(buttons),
-            parse_mode=ParseMode.MARKDOWN
-        )
+        handler = self._routes.get(query.data)
+        if handler:
+            await handler(query)
     
-    async def _show_sports_menu(self, query):
-        """منوی ورزشی"""
-        status = "✅ Active" if self.sports_predictor else "⏳ Limited"
-        
-        text = f"""
-⚽ **Sports Predictions**
-Status: {status}
-
-**Available sports:**
-• Football
-• Basketball
-• Tennis
-• And more...
-
-**Note:** Basic predictions available even without ML.
-        """
-        
-        buttons = [
-            [InlineKeyboardButton("🔙 Back", callback_data='back_main')]
-        ]
-        
-        await query.edit_message_text(
-            text,
-            reply_markup=InlineKeyboardMarkup(buttons),
-            parse_mode=ParseMode.MARKDOWN
-        )
+    async def _edit(self, query, text: str, reply_markup: InlineKeyboardMarkup):
+        """ویرایش پیام منو؛ خطای «بدون تغییر» (دوبار زدن دکمه) نادیده گرفته می‌شود"""
+        try:
+            await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
+        except BadRequest as e:
+            if 'not modified' not in str(e):
+                raise
     
-    async def _show_events_menu(self, query):
-        """منوی رویدادها"""
-        status = "✅ Active" if self.event_predictor else "⏳ Limited"
-        
-        text = f"""
-🌍 **Event Predictions**
-Status: {status}
-
-**Available events:**
-• Elections
-• Weather
-• Awards
-• Custom events
-        """
-        
-        buttons = [
-            [InlineKeyboardButton("🔙 Back", callback_data='back_main')]
-        ]
-        
-        await query.edit_message_text(
-            text,
-            reply_markup=InlineKeyboardMarkup(buttons),
-            parse_mode=ParseMode.MARKDOWN
-        )
+    async def _go_main(self, query):
+        """بازگشت به منوی اصلی"""
+        # پیام همین الان منوی اصلی را نشان می‌دهد؛ درخواست ویرایش لازم نیست
+        if query.message and query.message.reply_markup == _MAIN_MENU:
+            return
+        await self._show_static(query)
     
-    async def _show_numerology_menu(self, query):
-        """منوی عددشناسی"""
-        text = """
-🔢 **Numerology**
-Status: ✅ Always Active
-
-**Available calculations:**
-• Life Path Number
-• Name Number
-• Personal Day
-• Gematria
-• Compatibility
-        """
-        
-        buttons = [
-            [InlineKeyboardButton("📅 Life Path", callback_data='num_life_path')],
-            [InlineKeyboardButton("📝 Name Number", callback_data='num_name')],
-            [InlineKeyboardButton("❤️ Compatibility", callback_data='num_compatibility')],
-            [InlineKeyboardButton("🔙 Back", callback_data='back_main')]
-        ]
-        
-        await query.edit_message_text(
-            text,
-            reply_markup=InlineKeyboardMarkup(buttons),
-            parse_mode=ParseMode.MARKDOWN
-        )
+    async def _show_static(self, query):
+        """نمایش صفحه ثابت بر اساس callback_data"""
+        text, reply_markup = self._screens[query.data]
+        await self._edit(query, text, reply_markup)
     
-    async def _show_wallet(self, query):
-        """نمایش کیف پول"""
-        text = """
-💰 **Wallet**
-Status: Processing...
-
-• Balance: $0.00
-• Total predictions: 0
-• Success rate: 0%
-
-**Note:** Payment system initializing.
-        """
-        
-        buttons = [
-            [InlineKeyboardButton("📥 Deposit", callback_data='wallet_deposit')],
-            [InlineKeyboardButton("🔙 Back", callback_data='back_main')]
-        ]
-        
-        await query.edit_message_text(
-            text,
-            reply_markup=InlineKeyboardMarkup(buttons),
-            parse_mode=ParseMode.MARKDOWN
-        )
+    def _profile_payload(self, user_id: int) -> Tuple[str, InlineKeyboardMarkup]:
+        """متن و کیبورد پروفایل؛ مشترک بین دکمه و دستور /profile"""
+        text = self._profile_template.format(user_id=user_id, joined=date.today().isoformat())
+        return text, _BACK_MENU
     
     async def _show_profile(self, query):
-        """نمایش پروفایل"""
-        user_id = query.from_user.id
-        
-        text = f"""
-📊 **Your Profile**
-
-🆔 ID: `{user_id}`
-📅 Joined: {datetime.now().strftime('%Y-%m-%d')}
-
-**Active Features:**
-• Numerology: ✅
-• Crypto: {self._get_status_emoji(self.token_analyzer)}
-• Sports: {self._get_status_emoji(self.sports_predictor)}
-• Events: {self._get_status_emoji(self.event_predictor)}
-• Wallet: {self._get_status_emoji(self.payment_verifier)}
-        """
-        
-        buttons = [
-            [InlineKeyboardButton("🔙 Back", callback_data='back_main')]
-        ]
-        
-        await query.edit_message_text(
-            text,
-            reply_markup=InlineKeyboardMarkup(buttons),
-            parse_mode=ParseMode.MARKDOWN
-        )
-    
-    async def _show_knowledge(self, query):
-        """نمایش دانشنامه"""
-        text = """
-📚 **Knowledge Base**
-
-**Number Meanings:**
-1️⃣ Leadership, independence
-2️⃣ Cooperation, diplomacy
-3️⃣ Creativity, expression
-4️⃣ Stability, discipline
-5️⃣ Freedom, adventure
-6️⃣ Responsibility, love
-7️⃣ Wisdom, analysis
-8️⃣ Power, success
-9️⃣ Humanitarianism
-
-**Sources:**
-• Numbers: Their Occult Power
-• Kabala of Numbers
-• Three Books of Occult Philosophy
-        """
-        
-        buttons = [
-            [InlineKeyboardButton("🔙 Back", callback_data='back_main')]
-        ]
-        
-        await query.edit_message_text(
-            text,
-            reply_markup=InlineKeyboardMarkup(buttons),
-            parse_mode=ParseMode.MARKDOWN
-        )
-    
-    async def _show_help(self, query):
-        """نمایش راهنما"""
-        text = """
-❓ **Help & Support**
-
-**Commands:**
-/start - Main menu
-/balance - Check balance
-/profile - Your profile
-/help - This menu
-
-**Features:**
-• All features work even with limited libraries
-• Self-healing system active
-• Automatic error recovery
-• Continuous evolution
-
-**Support:**
-@UltimateOracleBot
-        """
-        
-        buttons = [
-            [InlineKeyboardButton("🔙 Back", callback_data='back_main')]
-        ]
-        
-        await query.edit_message_text(
-            text,
-            reply_markup=InlineKeyboardMarkup(buttons),
-            parse_mode=ParseMode.MARKDOWN
-        )
+        """نمایش پروفایل (دکمه)"""
+        await self._edit(query, *self._profile_payload(query.from_user.id))
     
     @safe_async_execute(default_return=None)
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -450,7 +485,9 @@ Status: Processing...
             elif text == '/balance':
                 await update.message.reply_text("💰 Balance: $0.00")
             elif text == '/profile':
-                await self._show_profile(update.message)
+                # Message متد edit_message_text ندارد؛ پاسخ جدید ارسال می‌شود
+                text, reply_markup = self._profile_payload(update.effective_user.id)
+                await update.message.reply_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
             else:
                 await update.message.reply_text("Unknown command")
         else:
@@ -460,15 +497,91 @@ Status: Processing...
                 reply_markup=self.get_main_menu()
             )
     
+    async def _run_webhook(self, app: Application, base_url: str, port: int, secret: str, allowed_updates: list):
+        """
+        دریافت آپدیت‌ها با webhook روی همان پورتی که health check را جواب می‌دهد
+        (روی Railway فقط $PORT در دسترس است؛ GET / برای health، POST /tg/<secret> برای تلگرام)
+        """
+        path = f"/tg/{secret}"
+        
+        async def health(request: web.Request) -> web.Response:
+            return web.Response(text='OK')
+        
+        async def telegram_update(request: web.Request) -> web.Response:
+            if request.headers.get('X-Telegram-Bot-Api-Secret-Token') != secret:
+                return web.Response(status=403)
+            await app.update_queue.put(Update.de_json(await request.json(), app.bot))
+            return web.Response()
+        
+        web_app = web.Application()
+        web_app.router.add_get('/', health)
+        web_app.router.add_post(path, telegram_update)
+        runner = web.AppRunner(web_app, access_log=None)
+        
+        # توقف با SIGINT/SIGTERM (مثل run_polling)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        
+        async with app:
+            # run_polling خودش post_init/post_shutdown را صدا می‌زند؛ اینجا دستی
+            await self._post_init(app)
+            await app.bot.set_webhook(
+                url=base_url.rstrip('/') + path,
+                secret_token=secret,
+                allowed_updates=allowed_updates,
+                max_connections=100
+            )
+            await app.start()
+            await runner.setup()
+            await web.TCPSite(runner, '0.0.0.0', port).start()
+            logger.info("✅ Webhook and health check listening on port %d", port)
+            try:
+                await stop.wait()
+            finally:
+                await runner.cleanup()
+                await app.stop()
+                await self.shutdown(app)
+    
     def run(self):
         """اجرای ربات"""
-        from config import TELEGRAM_TOKEN
-        
-        app = Application.builder().token(TELEGRAM_TOKEN).build()
+        from config import TELEGRAM_TOKEN, WEBHOOK_URL, WEBHOOK_SECRET, WEBHOOK_PORT
+        
+        if HAS_UVLOOP:
+            uvloop.install()
+        
+        # آپدیت‌های چت‌های مختلف هم‌زمان پردازش می‌شوند تا یک تحلیل طولانی بقیه را معطل نکند
+        builder = (
+            Application.builder()
+            .token(TELEGRAM_TOKEN)
+            .request(HTTPXRequest(
+                connection_pool_size=256,
+                http_version='1.1',
+                pool_timeout=5,
+                connect_timeout=5,
+                read_timeout=20
+            ))
+            .concurrent_updates(256)
+            .post_init(self._post_init)
+            .post_shutdown(self.shutdown)
+        )
+        if HAS_RATE_LIMITER:
+            # رعایت محدودیت ارسال تلگرام (30 پیام در ثانیه، با کمی حاشیه)
+            builder = builder.rate_limiter(AIORateLimiter(overall_max_rate=29, overall_time_period=1, max_retries=3))
+        app = builder.build()
         
         app.add_handler(CommandHandler("start", self.start))
         app.add_handler(CallbackQueryHandler(self.button_handler))
         app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
         
-        logger.info("🚀 Bot starting...")
-        app.run_polling()
+        # فقط آپدیت‌هایی که هندلر دارند از تلگرام دریافت می‌شوند
+        allowed_updates = ['message', 'callback_query']
+        
+        if WEBHOOK_URL:
+            secret = WEBHOOK_SECRET or secrets.token_urlsafe(32)
+            logger.info("🚀 Bot starting (webhook on port %d)...", WEBHOOK_PORT)
+            asyncio.run(self._run_webhook(app, WEBHOOK_URL, WEBHOOK_PORT, secret, allowed_updates))
+        else:
+            logger.info("🚀 Bot starting...")
+            app.run_polling(allowed_updates=allowed_updates)
@@ -1,5 +1,6 @@
 # config.py
 import os
+from dataclasses import dataclass
 from pathlib import Path
 from datetime import datetime, timedelta
 
@@ -8,6 +9,12 @@ TELEGRAM_TOKEN = "7358190664:AAGMFdD6HFP0CEQx_3Hv1YCMtWzAsVWgsJk"
 BOT_USERNAME = "UltimateOracleBot"
 BOT_NAME = "🔮 The Ultimate Oracle"
 
+# Webhook (اگر WEBHOOK_URL خالی باشد ربات با polling اجرا می‌شود)
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "")  # مثال: https://example.com
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET", "")  # خالی = تولید تصادفی در هر اجرا
+# پیش‌فرض $PORT؛ در حالت webhook همین پورت health check (GET /) را هم جواب می‌دهد
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", os.environ.get("PORT", 8443)))
+
 # ==================== ADMIN ====================
 ADMIN_USER_IDS = []  # بعداً با /admin آیدی خودتو اضافه می‌کنی
 ADMIN_COMMANDS = [
@@ -65,6 +72,19 @@ PRICING = {
     "custom_query": 1.99,             # سوال دلخواه
 }
 
+@dataclass(frozen=True, slots=True)
+class Pricing:
+    """قیمت‌ها با دسترسی attribute (فقط‌خواندنی)"""
+    basic_prediction: float
+    deep_analysis: float
+    whale_alert: float
+    monthly_api: float
+    vip_monthly: float
+    lifetime_access: float
+    custom_query: float
+
+PRICES = Pricing(**PRICING)
+
 # ==================== PAYMENT VERIFICATION ====================
 PAYMENT_CONFIRMATIONS_NEEDED = 2  # تعداد بلاک‌های تایید
 PAYMENT_POLL_INTERVAL = 60  # ثانیه
@@ -129,6 +149,7 @@ REFERRAL_BONUS_PERCENT = 10  # 10% پاداش معرفی
 DAILY_TWEETS = 5
 AUTO_PROMOTE_INTERVAL = 3600  # ثانیه
 MARKETING_CHANNELS = ["telegram", "twitter", "reddit", "instagram"]
+ENABLE_SELF_MARKETING = True  # بازاریابی خودکار
 WELCOME_BONUS = 0.32  # USDT شارژ اولیه
 
 # ==================== BACKUP ====================
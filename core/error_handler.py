@@ -7,12 +7,16 @@
 
 import logging
 import sys
+import time
 import traceback
 from functools import wraps
 from typing import Callable, Any
 
 logger = logging.getLogger(__name__)
 
+# خطاهای هم‌نوع در این بازه (ثانیه) فقط یک بار لاگ می‌شوند؛ بقیه شمرده می‌شوند
+ERROR_LOG_INTERVAL = 60
+
 class ErrorHandler:
     """
     کلاس مدیریت خطاها با قابلیت logging و recovery
@@ -22,6 +26,8 @@ class ErrorHandler:
         self.error_count = 0
         self.error_history = []
         self.recovery_strategies = {}
+        # نوع خطا -> [زمان آخرین لاگ (monotonic), تعداد لاگ‌نشده]
+        self._log_window = {}
         logger.info("🔰 ErrorHandler initialized")
         
     def handle_error(self, error: Exception, context: dict = None):
@@ -44,14 +50,32 @@ class ErrorHandler:
         if len(self.error_history) > 100:
             self.error_history = self.error_history[-100:]
         
-        # لاگ کردن
-        logger.error(f"❌ Error #{self.error_count}: {error_type} - {error}")
+        # لاگ کردن (با stack؛ سیل خطاهای تکراری در هر بازه یک خط می‌شود)
+        self._log_error(error, error_type)
         
         # تلاش برای recovery
         self.try_recovery(error, context)
         
         return error_info
     
+    def _log_error(self, error: Exception, error_type: str):
+        """لاگ خطا با محدودیت نرخ برای هر نوع خطا"""
+        now = time.monotonic()
+        window = self._log_window.get(error_type)
+        
+        if window and now - window[0] < ERROR_LOG_INTERVAL:
+            window[1] += 1
+            return
+        
+        suppressed = window[1] if window else 0
+        self._log_window[error_type] = [now, 0]
+        
+        if suppressed:
+            logger.error("❌ Error #%d: %s - %s (+%d similar suppressed)",
+                         self.error_count, error_type, error, suppressed, exc_info=error)
+        else:
+            logger.error("❌ Error #%d: %s - %s", self.error_count, error_type, error, exc_info=error)
+    
     def try_recovery(self, error: Exception, context: dict = None):
         """تلاش برای بازیابی از خطا"""
         
@@ -34,6 +34,14 @@ from database.models import NumberMeaning, Teaching, Book, get_db
 
 logger = logging.getLogger(__name__)
 
+def _digit_sum(num: int) -> int:
+    """جمع ارقام یک عدد مثبت (حسابی، بدون تبدیل به رشته)"""
+    total = 0
+    while num:
+        total += num % 10
+        num //= 10
+    return total
+
 class NumerologyEngine:
     """
     هسته اصلی عددشناسی با ۵ سیستم مختلف و هوش ترکیبی
@@ -79,6 +87,11 @@ class NumerologyEngine:
     POWER_NUMBERS = [3, 7, 9, 11, 22, 33]
     SACRED_NUMBERS = [3, 7, 12, 40, 108]
     
+    # نسخه set برای بررسی عضویت در حلقه کاهش
+    _MASTER_SET = frozenset(MASTER_NUMBERS)
+    _ANGEL_SET = frozenset(ANGEL_NUMBERS)
+    _SPECIAL_SET = _MASTER_SET | _ANGEL_SET
+    
     # ==================== تطابق‌های کیهانی ====================
     PLANETARY_RULERS = {
         1: 'Sun', 2: 'Moon', 3: 'Jupiter', 4: 'Uranus', 5: 'Mercury',
@@ -148,22 +161,22 @@ class NumerologyEngine:
             return 0
         
         # بررسی اعداد خاص
-        if keep_master and num in self.MASTER_NUMBERS:
+        if keep_master and num in self._MASTER_SET:
             return num
         
-        if keep_angel and num in self.ANGEL_NUMBERS:
+        if keep_angel and num in self._ANGEL_SET:
             return num
         
         # کاهش تا رسیدن به یک رقم
-        while num > 9 and num not in self.MASTER_NUMBERS and num not in self.ANGEL_NUMBERS:
-            num = sum(int(d) for d in str(num))
+        while num > 9 and num not in self._SPECIAL_SET:
+            num = _digit_sum(num)
         
         return num
     
     def calculate_digital_root(self, num: int) -> int:
         """محاسبه ریشه دیجیتال (جمع مکرر تا یک رقم)"""
         while num > 9:
-            num = sum(int(d) for d in str(num))
+            num = _digit_sum(num)
         return num
     
     def calculate_frequency(self, num: int) -> float:
@@ -193,7 +206,7 @@ class NumerologyEngine:
         day = birth_date.day
         
         # روش ۱: کاهش مجزا
-        year_sum = self.reduce_number(sum(int(d) for d in str(year)), keep_master=False)
+        year_sum = self.reduce_number(_digit_sum(year), keep_master=False)
         month_sum = self.reduce_number(month, keep_master=False)
         day_sum = self.reduce_number(day, keep_master=False)
         
@@ -201,7 +214,8 @@ class NumerologyEngine:
         life_path1 = self.reduce_number(total1)
         
         # روش ۲: کاهش کلی
-        total_digits = sum(int(d) for d in f"{year}{month:02d}{day:02d}")
+        # برابر جمع ارقام YYYYMMDD (صفرهای پیشوند در جمع اثری ندارند)
+        total_digits = _digit_sum(year) + _digit_sum(month) + _digit_sum(day)
         life_path2 = self.reduce_number(total_digits)
         
         # روش ۳: روش پیشرفته (ترکیب هر سه)
@@ -513,7 +527,7 @@ class NumerologyEngine:
         month = bd.month
         day = bd.day
         year = bd.year
-        year_sum = sum(int(d) for d in str(year))
+        year_sum = _digit_sum(year)
         
         # چالش اول: تفاوت ماه و روز
         challenge1 = abs(self.reduce_number(month) - self.reduce_number(day))
@@ -540,7 +554,7 @@ class NumerologyEngine:
         
         month = self.reduce_number(bd.month)
         day = self.reduce_number(bd.day)
-        year = self.reduce_number(sum(int(d) for d in str(bd.year)))
+        year = self.reduce_number(_digit_sum(bd.year))
         
         # قله اول: ماه + روز
         pinnacle1 = self.reduce_number(month + day)
@@ -931,9 +945,9 @@ class NumerologyEngine:
             patterns.append("Self-referential pattern detected")
         
         # بررسی تکرار
-        from collections import Counter
         counter = Counter(numbers)
         most_common = counter.most_common(1)[0] if counter else (0, 0)
+        score = self.calculate_numerological_score(address)
         
         return {
             'total_sum': total,
@@ -941,7 +955,8 @@ class NumerologyEngine:
             'most_common_digit': most_common[0],
             'repetition_count': most_common[1],
             'has_master': any(n in self.MASTER_NUMBERS for n in numbers),
-            'numerological_score': self.calculate_numerological_score(address),
+            'numerological_score': score,
+            'numerological_score_01': score / 100.0,  # نرمال‌شده در بازه 0 تا 1
             'interpretation': self.get_quick_interpretation(reduced),
             'lucky': reduced in [1, 3, 7, 8, 9],
             'patterns': patterns
@@ -1,12 +1,28 @@
 # database/models.py
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Boolean, JSON, ForeignKey, LargeBinary, BigInteger, Index
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Boolean, JSON, ForeignKey, LargeBinary, BigInteger, Index, DDL, event, select, func, text, bindparam
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 import os
 from config import DATABASE_URL
 
+# orjson اختیاری است؛ برای سریال‌سازی سریع‌تر ستون‌های JSON
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# سشن async اختیاری است (نیاز به aiosqlite برای SQLite)
+try:
+    import aiosqlite  # noqa: F401
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    HAS_ASYNC_DB = True
+except ImportError:
+    HAS_ASYNC_DB = False
+
 Base = declarative_base()
 
 class User(Base):
@@ -14,7 +30,7 @@ class User(Base):
     __tablename__ = 'users'
     
     id = Column(Integer, primary_key=True)
-    telegram_id = Column(BigInteger, unique=True, nullable=False, index=True)
+    telegram_id = Column(BigInteger, unique=True, nullable=False)  # ایندکس unique برای جستجو کافی است
     username = Column(String(255))
     first_name = Column(String(255))
     last_name = Column(String(255))
@@ -75,8 +91,9 @@ class User(Base):
     notifications = relationship("Notification", back_populates="user", cascade="all, delete-orphan")
     
     __table_args__ = (
-        Index('idx_user_telegram', telegram_id),
         Index('idx_user_referral', referral_code),
+        Index('idx_user_last_active', last_active),
+        Index('idx_user_created', created_at, id),  # صفحه‌بندی keyset
     )
 
 class Prediction(Base):
@@ -84,7 +101,7 @@ class Prediction(Base):
     __tablename__ = 'predictions'
     
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     
     # نوع پیش‌بینی
     pred_type = Column(String(50), nullable=False)  # crypto, sports, event, custom
@@ -156,10 +173,11 @@ class Prediction(Base):
     feedback = relationship("Feedback", uselist=False, back_populates="prediction", cascade="all, delete-orphan")
     
     __table_args__ = (
-        Index('idx_prediction_user', user_id),
+        Index('idx_prediction_user_created', user_id, created_at),  # پیش‌بینی‌های اخیر هر کاربر
         Index('idx_prediction_type', pred_type),
         Index('idx_prediction_date', predicted_at),
         Index('idx_prediction_token', token_address),
+        Index('idx_prediction_correct', was_correct, sqlite_where=was_correct == True),
     )
 
 class Transaction(Base):
@@ -202,8 +220,98 @@ class Transaction(Base):
         Index('idx_transaction_user', user_id),
         Index('idx_transaction_hash', tx_hash),
         Index('idx_transaction_status', status),
+        Index('idx_transaction_status_type_amount', status, tx_type, amount),  # covering برای SUM
+        Index('idx_transaction_created', created_at, id),  # صفحه‌بندی keyset
+    )
+
+class RevenueAggregate(Base):
+    """تجمیع درآمد ساعتی/روزانه (با trigger روی transactions به‌روز می‌شود)"""
+    __tablename__ = 'revenue_aggregates'
+    
+    id = Column(Integer, primary_key=True)
+    bucket_kind = Column(String(10), nullable=False)  # hour, day
+    bucket_ts = Column(DateTime, nullable=False)  # شروع بازه
+    amount_sum = Column(Float, default=0.0)
+    tx_count = Column(Integer, default=0)
+    
+    __table_args__ = (
+        Index('idx_revenue_bucket', bucket_kind, bucket_ts, unique=True),
     )
 
+# فرمت شروع بازه برای هر نوع تجمیع (% برای DDL دوبل شده)
+# همان فرمت رشته‌ای DateTime در SQLAlchemy (با میکروثانیه)؛ وگرنه مقایسه رشته‌ای
+# با پارامترهای datetime (مثل bucket_ts >= start) بازه ابتدای روز را جا می‌اندازد
+REVENUE_BUCKETS = {
+    'hour': '%%Y-%%m-%%d %%H:00:00.000000',
+    'day': '%%Y-%%m-%%d 00:00:00.000000',
+}
+
+_REVENUE_UPSERT = """
+        INSERT INTO revenue_aggregates (bucket_kind, bucket_ts, amount_sum, tx_count)
+        VALUES ('{kind}', strftime('{fmt}', NEW.created_at), NEW.amount, 1)
+        ON CONFLICT (bucket_kind, bucket_ts) DO UPDATE SET
+            amount_sum = amount_sum + excluded.amount_sum,
+            tx_count = tx_count + 1;"""
+
+_REVENUE_UPSERTS = "".join(
+    _REVENUE_UPSERT.format(kind=kind, fmt=fmt) for kind, fmt in REVENUE_BUCKETS.items()
+)
+
+# پرداخت‌هایی که مستقیماً completed ثبت می‌شوند
+_REVENUE_INSERT_TRIGGER = DDL(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_revenue_insert AFTER INSERT ON transactions
+    WHEN NEW.tx_type = 'payment' AND NEW.status = 'completed'
+    BEGIN{_REVENUE_UPSERTS}
+    END
+""")
+
+# پرداخت‌هایی که بعداً از pending به completed می‌رسند
+_REVENUE_UPDATE_TRIGGER = DDL(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_revenue_update AFTER UPDATE OF status ON transactions
+    WHEN NEW.tx_type = 'payment' AND NEW.status = 'completed' AND OLD.status IS NOT 'completed'
+    BEGIN{_REVENUE_UPSERTS}
+    END
+""")
+
+# ساخت بازه‌ها از تراکنش‌های خام (برای پر کردن اولیه و بازسازی دوره‌ای)
+_REVENUE_ROLLUP = """
+    INSERT INTO revenue_aggregates (bucket_kind, bucket_ts, amount_sum, tx_count)
+    SELECT '{kind}', strftime('{fmt}', created_at), SUM(amount), COUNT(*)
+    FROM transactions
+    WHERE tx_type = 'payment' AND status = 'completed'{where}
+    GROUP BY strftime('{fmt}', created_at)
+"""
+
+# پر کردن اولیه از تراکنش‌های موجود
+_REVENUE_BACKFILL = [
+    DDL(_REVENUE_ROLLUP.format(kind=_kind, fmt=_fmt, where=''))
+    for _kind, _fmt in REVENUE_BUCKETS.items()
+]
+
+def _install_revenue_rollup(metadata, connection, tables=(), **kw):
+    """
+    triggerها و پر کردن اولیه بعد از ساخت همه جداول create_all
+    (روی after_create خود revenue_aggregates، جدول transactions هنوز وجود ندارد)
+    """
+    if connection.dialect.name != 'sqlite':
+        return
+    
+    connection.execute(_REVENUE_INSERT_TRIGGER)
+    connection.execute(_REVENUE_UPDATE_TRIGGER)
+    
+    # فقط وقتی جدول تجمیع تازه ساخته شده؛ وگرنه بازه‌ها تکراری می‌شوند
+    if RevenueAggregate.__table__ in tables:
+        for statement in _REVENUE_BACKFILL:
+            connection.execute(statement)
+
+event.listen(Base.metadata, 'after_create', _install_revenue_rollup)
+
+# بازسازی بازه‌های اخیر (در text() نیازی به دوبل کردن % نیست)
+_REVENUE_REFRESH = [
+    text(_REVENUE_ROLLUP.format(kind=_kind, fmt=_fmt.replace('%%', '%'), where=" AND created_at >= :since"))
+    for _kind, _fmt in REVENUE_BUCKETS.items()
+]
+
 class TokenAnalysis(Base):
     """تحلیل توکن‌ها"""
     __tablename__ = 'token_analyses'
@@ -470,10 +578,45 @@ class MarketSentiment(Base):
     )
 
 # ==================== Database Setup ====================
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
+def _json_dumps(obj) -> str:
+    """سریال‌سازی ستون‌های JSON با orjson (کلیدهای غیررشته‌ای و numpy هم پشتیبانی می‌شوند)"""
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+
+# بدون orjson، SQLAlchemy از json استاندارد استفاده می‌کند
+_JSON_OPTIONS = {'json_serializer': _json_dumps, 'json_deserializer': orjson.loads} if HAS_ORJSON else {}
+
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {},
+    future=True,
+    **_JSON_OPTIONS
+)
+
+def _set_sqlite_pragmas(dbapi_conn, connection_record):
+    """WAL برای خواندن هم‌زمان با نوشتن، busy_timeout به جای خطای database is locked"""
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+if "sqlite" in DATABASE_URL:
+    event.listen(engine, 'connect', _set_sqlite_pragmas)
+
 Base.metadata.create_all(engine)
 SessionLocal = sessionmaker(bind=engine)
 
+# سشن async برای هندلرهای ربات؛ هر درخواست سشن خودش را باز می‌کند
+# async with AsyncSessionLocal() as s: ...
+AsyncSessionLocal = None
+if HAS_ASYNC_DB and "sqlite" in DATABASE_URL:
+    async_engine = create_async_engine(DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1), **_JSON_OPTIONS)
+    event.listen(async_engine.sync_engine, 'connect', _set_sqlite_pragmas)
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+# جستجوی کاربر با telegram_id؛ یک بار ساخته می‌شود و SQLAlchemy نسخه کامپایل‌شده را کش می‌کند
+# db.execute(USER_BY_TELEGRAM_ID, {'telegram_id': tid}).scalar_one_or_none()
+USER_BY_TELEGRAM_ID = select(User).where(User.telegram_id == bindparam('telegram_id'))
+
 def get_db():
     """دریافت session دیتابیس"""
     db = SessionLocal()
@@ -482,10 +625,76 @@ def get_db():
     finally:
         db.close()
 
+def approx_count(db, table) -> int:
+    """
+    تعداد تقریبی ردیف‌های جدول از آمار ANALYZE (sqlite_stat1)
+    اگر آمار موجود نباشد، COUNT(*) واقعی برگردانده می‌شود
+    """
+    stat = None
+    if db.bind.dialect.name == 'sqlite':
+        try:
+            # عدد اول stat تعداد ردیف‌های ایندکس است (ایندکس‌های partial کمتر دارند)
+            stat = db.execute(
+                text("SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE tbl = :tbl"),
+                {'tbl': table.name}
+            ).scalar()
+        except OperationalError:
+            # ANALYZE هنوز اجرا نشده
+            stat = None
+    
+    if stat is not None:
+        return stat
+    return db.execute(select(func.count()).select_from(table)).scalar()
+
+def refresh_revenue_aggregates(hours: int = 48) -> datetime:
+    """
+    بازسازی تجمیع درآمد چند ساعت اخیر از روی تراکنش‌های خام
+    trigger‌ها فقط ثبت/تکمیل پرداخت را می‌بینند؛ این کار برگشت وضعیت،
+    ویرایش مبلغ و حذف را هم اصلاح می‌کند
+    """
+    # از ابتدای روز تا بازه روزانه هم کامل بازسازی شود
+    since = (datetime.utcnow() - timedelta(hours=hours)).replace(hour=0, minute=0, second=0, microsecond=0)
+    since_ts = since.strftime('%Y-%m-%d %H:%M:%S.%f')
+    
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM revenue_aggregates WHERE bucket_ts >= :since"), {'since': since_ts})
+        for statement in _REVENUE_REFRESH:
+            conn.execute(statement, {'since': since_ts})
+    
+    return since
+
+def analyze_database():
+    """به‌روزرسانی آمار SQLite (sqlite_stat1) برای approx_count و انتخاب ایندکس"""
+    if engine.dialect.name != 'sqlite':
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+_DROPPED_INDEXES = ('idx_user_telegram', 'ix_users_telegram_id', 'idx_prediction_user', 'ix_predictions_user_id')
+
 def init_database():
     """ایجاد جداول و داده‌های اولیه"""
     Base.metadata.create_all(engine)
     
+    # ایندکس‌های تکراری قبلی (پوشش داده شده با ایندکس unique یا ترکیبی)
+    with engine.begin() as conn:
+        for name in _DROPPED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    
+    # بازه‌های قدیمی بدون میکروثانیه ذخیره شده بودند
+    with engine.begin() as conn:
+        conn.execute(text(
+            "UPDATE revenue_aggregates SET bucket_ts = bucket_ts || '.000000' WHERE length(bucket_ts) = 19"
+        ))
+    
+    # create_all برای جداول موجود ایندکس جدید نمی‌سازد
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    
+    # آمار اولیه برای شمارش تقریبی؛ بعد از آن روزانه توسط ربات تازه می‌شود
+    analyze_database()
+    
     # ایجاد معانی پایه اعداد اگر وجود ندارن
     db = SessionLocal()
     if db.query(NumberMeaning).count() == 0:
@@ -16,8 +16,9 @@ import aiohttp
 from typing import Dict, List, Optional, Tuple, Any
 from datetime import datetime, timedelta
 import json
+import time
 import numpy as np
-from collections import defaultdict
+from collections import defaultdict, Counter, OrderedDict
 import logging
 import re
 import random
@@ -38,6 +39,9 @@ from config import *
 
 logger = logging.getLogger(__name__)
 
+# حداکثر تعداد نتیجه پیش‌بینی در کش (قدیمی‌ترین‌ها حذف می‌شوند)
+PREDICTION_CACHE_MAX = 1024
+
 class EventPredictor:
     """
     پیش‌بینی‌کننده هر نوع رویدادی در جهان
@@ -128,8 +132,12 @@ class EventPredictor:
     NASA_API = "https://api.nasa.gov"
     USGS_API = "https://earthquake.usgs.gov/fdsnws/event/1"
     
-    def __init__(self, db_session=None, numerology=None, ai=None):
+    def __init__(self, db_session=None, numerology=None, ai=None, http=None):
         self.db = db_session
+        # session مشترک HTTP (از ربات)؛ اگر نباشد یکی ساخته می‌شود
+        self.http = http
+        # sessionی که خود پیش‌بین ساخته (فقط همین در close بسته می‌شود)
+        self._own_http = None
         self.numerology = numerology or NumerologyEngine(db_session)
         self.ai = ai or GeniusAI(db_session, self.numerology)
         
@@ -140,12 +148,29 @@ class EventPredictor:
         # کش
         self.cache = {}
         self.cache_timeout = 3600  # 1 ساعت
+        self.prediction_cache_timeout = 300  # 5 دقیقه برای نتیجه پیش‌بینی
+        # کش نتیجه پیش‌بینی به ترتیب زمان درج؛ منقضی‌ها و مازاد PREDICTION_CACHE_MAX هنگام درج حذف می‌شوند
+        self.prediction_cache = OrderedDict()
         
         # داده‌های تاریخی
         self.historical_events = self.load_historical_events()
         
         logger.info("🌍 EventPredictor initialized with 8 categories and 20+ subcategories")
     
+    async def _get_http(self) -> aiohttp.ClientSession:
+        """session مشترک HTTP با connection pool"""
+        if self.http is None or self.http.closed:
+            self.http = self._own_http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=50, ttl_dns_cache=300)
+            )
+        return self.http
+    
+    async def close(self):
+        """بستن session HTTP ساخته‌شده توسط همین پیش‌بین (session تزریق‌شده مال ربات است)"""
+        if self._own_http is not None and not self._own_http.closed:
+            await self._own_http.close()
+        self._own_http = None
+    
     def load_historical_events(self):
         """بارگذاری رویدادهای تاریخی مهم"""
         
@@ -243,6 +268,32 @@ class EventPredictor:
     # ==================== پیش‌بینی رویداد ====================
     
     async def predict_event(self, query: str) -> Dict[str, Any]:
+        """پیش‌بینی رویداد با کش کوتاه‌مدت بر اساس متن نرمال‌شده"""
+        cache_key = "event_" + ' '.join(query.lower().split())
+        cached = self.prediction_cache.get(cache_key)
+        if cached and time.time() - cached[0] < self.prediction_cache_timeout:
+            return cached[1]
+        
+        result = await self._predict_event(query)
+        if 'error' not in result:
+            self._cache_prediction(cache_key, result)
+        return result
+    
+    def _cache_prediction(self, cache_key: str, result: Dict[str, Any]):
+        """درج در کش پیش‌بینی با حذف ورودی‌های منقضی و قدیمی‌ترین‌ها"""
+        now = time.time()
+        cache = self.prediction_cache
+        cache[cache_key] = (now, result)
+        cache.move_to_end(cache_key)
+        
+        # ترتیب درج = ترتیب زمان؛ از ابتدا تا اولین ورودی معتبر حذف می‌شود
+        while cache:
+            oldest_time, _ = next(iter(cache.values()))
+            if now - oldest_time < self.prediction_cache_timeout and len(cache) <= PREDICTION_CACHE_MAX:
+                break
+            cache.popitem(last=False)
+    
+    async def _predict_event(self, query: str) -> Dict[str, Any]:
         """
         پیش‌بینی هر نوع رویدادی
         
@@ -283,7 +334,7 @@ class EventPredictor:
             'news': news_analysis
         }
         
-        ai_prediction = await self.ai.predict(ai_input, 'event')
+        ai_prediction = self.ai.predict(ai_input, 'event')
         
         # ==================== ترکیب نتایج ====================
         
@@ -434,7 +485,6 @@ class EventPredictor:
                     
                     if outcomes:
                         # تشخیص الگو
-                        from collections import Counter
                         counter = Counter(outcomes)
                         most_common = counter.most_common(1)
                         
@@ -489,49 +539,49 @@ class EventPredictor:
         
         try:
             # دریافت اخبار از NewsAPI
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.NEWS_API}/everything"
-                params = {
-                    'q': query[:100],  # محدودیت طول
-                    'apiKey': NEWS_API_KEY,
-                    'language': 'en',
-                    'sortBy': 'relevancy',
-                    'pageSize': 10
-                }
+            session = await self._get_http()
+            url = f"{self.NEWS_API}/everything"
+            params = {
+                'q': query[:100],  # محدودیت طول
+                'apiKey': NEWS_API_KEY,
+                'language': 'en',
+                'sortBy': 'relevancy',
+                'pageSize': 10
+            }
                 
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        articles = data.get('articles', [])
-                        
-                        result['mentions'] = len(articles)
-                        
-                        # تحلیل احساسات اخبار
-                        sentiments = []
-                        for article in articles[:5]:
-                            title = article.get('title', '')
-                            description = article.get('description', '') or ''
-                            
-                            # تحلیل با AI
-                            sentiment = await self._analyze_text_sentiment(f"{title} {description}")
-                            sentiments.append(sentiment)
-                            
-                            result['articles'].append({
-                                'title': title[:100],
-                                'source': article.get('source', {}).get('name', ''),
-                                'url': article.get('url', '')
-                            })
-                        
-                        if sentiments:
-                            result['sentiment'] = np.mean(sentiments)
-                            result['confidence'] = min(len(sentiments) / 10, 1)
+            async with session.get(url, params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    articles = data.get('articles', [])
+                    
+                    result['mentions'] = len(articles)
+                    
+                    # تحلیل احساسات اخبار
+                    sentiments = []
+                    for article in articles[:5]:
+                        title = article.get('title', '')
+                        description = article.get('description', '') or ''
                         
-                        # تشخیص روند
-                        result['trending'] = result['mentions'] > 5
+                        # تحلیل با AI
+                        sentiment = await self._analyze_text_sentiment(f"{title} {description}")
+                        sentiments.append(sentiment)
                         
-                        # استخراج کلمات کلیدی
-                        all_text = ' '.join([a['title'] for a in result['articles']])
-                        result['key_phrases'] = self._extract_key_phrases(all_text)[:5]
+                        result['articles'].append({
+                            'title': title[:100],
+                            'source': article.get('source', {}).get('name', ''),
+                            'url': article.get('url', '')
+                        })
+                    
+                    if sentiments:
+                        result['sentiment'] = np.mean(sentiments)
+                        result['confidence'] = min(len(sentiments) / 10, 1)
+                    
+                    # تشخیص روند
+                    result['trending'] = result['mentions'] > 5
+                    
+                    # استخراج کلمات کلیدی
+                    all_text = ' '.join([a['title'] for a in result['articles']])
+                    result['key_phrases'] = self._extract_key_phrases(all_text)[:5]
         
         except Exception as e:
             logger.error(f"News analysis error: {e}")
@@ -556,7 +606,6 @@ class EventPredictor:
             if words[i] not in stopwords and words[i+1] not in stopwords:
                 phrases.append(f"{words[i]} {words[i+1]}")
         
-        from collections import Counter
         counter = Counter(phrases)
         return [p for p, _ in counter.most_common(max_phrases)]
     
@@ -23,8 +23,11 @@ def run_health():
     logger.info(f"✅ Health server on port {port}")
     server.serve_forever()
 
-thread = threading.Thread(target=run_health, daemon=True)
-thread.start()
+# در حالت webhook، خود ربات روی $PORT به health check جواب می‌دهد
+from config import WEBHOOK_URL
+if not WEBHOOK_URL:
+    thread = threading.Thread(target=run_health, daemon=True)
+    thread.start()
 
 # ایمپورت ربات اصلی
 from bot.ultimate_bot import UltimateBot
@@ -26,7 +26,7 @@ from solana.publickey import PublicKey
 import base58
 
 # Local
-from database.models import Transaction, User, get_db
+from database.models import Transaction, User, get_db, USER_BY_TELEGRAM_ID
 from config import *
 
 logger = logging.getLogger(__name__)
@@ -404,7 +404,7 @@ class PaymentVerifier:
         
         try:
             # پیدا کردن کاربر
-            user = self.db.query(User).filter_by(telegram_id=user_id).first()
+            user = self.db.execute(USER_BY_TELEGRAM_ID, {'telegram_id': user_id}).scalar_one_or_none()
             if not user:
                 logger.error(f"User {user_id} not found for payment")
                 return
@@ -471,9 +471,9 @@ class PaymentVerifier:
             
             for tx in pending_txs:
                 # بررسی اینکه منقضی نشده
+                # commit یک‌جا در انتهای حلقه انجام می‌شود
                 if tx.expires_at and tx.expires_at < datetime.utcnow():
                     tx.status = 'expired'
-                    self.db.commit()
                     continue
                 
                 # تأیید مجدد
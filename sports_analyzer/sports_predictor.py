@@ -15,10 +15,12 @@ import aiohttp
 from typing import Dict, List, Optional, Tuple, Any
 from datetime import datetime, timedelta
 import json
+import time
 import numpy as np
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 import logging
 import re
+import random
 
 # Machine Learning
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
@@ -32,6 +34,9 @@ from config import *
 
 logger = logging.getLogger(__name__)
 
+# حداکثر تعداد نتیجه پیش‌بینی در کش (قدیمی‌ترین‌ها حذف می‌شوند)
+PREDICTION_CACHE_MAX = 1024
+
 class SportsPredictor:
     """
     پیش‌بینی‌کننده مسابقات ورزشی با پشتیبانی از ۱۰+ رشته ورزشی
@@ -173,8 +178,12 @@ class SportsPredictor:
     # عمومی
     SPORTS_API = "https://www.thesportsdb.com/api/v1/json/3"
     
-    def __init__(self, db_session=None, numerology=None, ai=None):
+    def __init__(self, db_session=None, numerology=None, ai=None, http=None):
         self.db = db_session
+        # session مشترک HTTP (از ربات)؛ اگر نباشد یکی ساخته می‌شود
+        self.http = http
+        # sessionی که خود پیش‌بین ساخته (فقط همین در close بسته می‌شود)
+        self._own_http = None
         self.numerology = numerology or NumerologyEngine(db_session)
         self.ai = ai or GeniusAI(db_session, self.numerology)
         
@@ -185,6 +194,9 @@ class SportsPredictor:
         # کش
         self.cache = {}
         self.cache_timeout = 3600  # 1 ساعت
+        self.prediction_cache_timeout = 300  # 5 دقیقه برای نتیجه پیش‌بینی
+        # کش نتیجه پیش‌بینی به ترتیب زمان درج؛ منقضی‌ها و مازاد PREDICTION_CACHE_MAX هنگام درج حذف می‌شوند
+        self.prediction_cache = OrderedDict()
         
         # آمار تیم‌ها و بازیکنان
         self.team_stats = {}
@@ -196,6 +208,20 @@ class SportsPredictor:
         
         logger.info("⚽ SportsPredictor initialized with 15+ sports")
     
+    async def _get_http(self) -> aiohttp.ClientSession:
+        """session مشترک HTTP با connection pool"""
+        if self.http is None or self.http.closed:
+            self.http = self._own_http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=50, ttl_dns_cache=300)
+            )
+        return self.http
+    
+    async def close(self):
+        """بستن session HTTP ساخته‌شده توسط همین پیش‌بین (session تزریق‌شده مال ربات است)"""
+        if self._own_http is not None and not self._own_http.closed:
+            await self._own_http.close()
+        self._own_http = None
+    
     def load_models(self):
         """بارگذاری مدل‌های آموزش دیده"""
         try:
@@ -357,28 +383,28 @@ class SportsPredictor:
         
         try:
             # جستجوی تیم در API
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.SPORTS_API}/searchteams.php"
-                params = {'t': team_name}
+            session = await self._get_http()
+            url = f"{self.SPORTS_API}/searchteams.php"
+            params = {'t': team_name}
                 
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data and 'teams' in data and data['teams']:
-                            team = data['teams'][0]
-                            
-                            # استخراج اطلاعات
-                            result['id'] = team.get('idTeam')
-                            result['league'] = team.get('strLeague')
-                            result['stadium'] = team.get('strStadium')
-                            result['capacity'] = team.get('intStadiumCapacity')
-                            result['formed_year'] = team.get('intFormedYear')
-                            result['badge'] = team.get('strTeamBadge')
-                            
-                            # عددشناسی نام تیم
-                            numerology = self.numerology.calculate_name_number(team_name)
-                            result['numerology'] = numerology
-                            result['team_number'] = numerology.get('expression', 5)
+            async with session.get(url, params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    if data and 'teams' in data and data['teams']:
+                        team = data['teams'][0]
+                        
+                        # استخراج اطلاعات
+                        result['id'] = team.get('idTeam')
+                        result['league'] = team.get('strLeague')
+                        result['stadium'] = team.get('strStadium')
+                        result['capacity'] = team.get('intStadiumCapacity')
+                        result['formed_year'] = team.get('intFormedYear')
+                        result['badge'] = team.get('strTeamBadge')
+                        
+                        # عددشناسی نام تیم
+                        numerology = self.numerology.calculate_name_number(team_name)
+                        result['numerology'] = numerology
+                        result['team_number'] = numerology.get('expression', 5)
             
             # دریافت فرم اخیر
             await self._get_team_form(result, sport)
@@ -397,8 +423,6 @@ class SportsPredictor:
         
         # TODO: دریافت از API واقعی
         # فعلاً داده‌های نمونه
-        import random
-        
         last_5 = []
         for i in range(5):
             result = random.choice(['W', 'W', 'D', 'L', 'L'])
@@ -456,27 +480,27 @@ class SportsPredictor:
         
         try:
             # جستجوی بازیکن در API
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.SPORTS_API}/searchplayers.php"
-                params = {'p': player_name}
+            session = await self._get_http()
+            url = f"{self.SPORTS_API}/searchplayers.php"
+            params = {'p': player_name}
                 
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data and 'player' in data and data['player']:
-                            player = data['player'][0]
-                            
-                            result['id'] = player.get('idPlayer')
-                            result['team'] = player.get('strTeam')
-                            result['nationality'] = player.get('strNationality')
-                            result['position'] = player.get('strPosition')
-                            result['age'] = player.get('dateBorn')
-                            
-                            # عددشناسی نام
-                            numerology = self.numerology.calculate_name_number(player_name)
-                            result['numerology'] = numerology
-                            result['player_number'] = numerology.get('expression', 5)
-                            
+            async with session.get(url, params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    if data and 'player' in data and data['player']:
+                        player = data['player'][0]
+                        
+                        result['id'] = player.get('idPlayer')
+                        result['team'] = player.get('strTeam')
+                        result['nationality'] = player.get('strNationality')
+                        result['position'] = player.get('strPosition')
+                        result['age'] = player.get('dateBorn')
+                        
+                        # عددشناسی نام
+                        numerology = self.numerology.calculate_name_number(player_name)
+                        result['numerology'] = numerology
+                        result['player_number'] = numerology.get('expression', 5)
+                        
         except Exception as e:
             logger.error(f"Error getting player data: {e}")
         
@@ -485,6 +509,32 @@ class SportsPredictor:
     # ==================== پیش‌بینی مسابقه ====================
     
     async def predict_match(self, query: str) -> Dict[str, Any]:
+        """پیش‌بینی مسابقه با کش کوتاه‌مدت بر اساس متن نرمال‌شده"""
+        cache_key = "match_" + ' '.join(query.lower().split())
+        cached = self.prediction_cache.get(cache_key)
+        if cached and time.time() - cached[0] < self.prediction_cache_timeout:
+            return cached[1]
+        
+        result = await self._predict_match(query)
+        if 'error' not in result:
+            self._cache_prediction(cache_key, result)
+        return result
+    
+    def _cache_prediction(self, cache_key: str, result: Dict[str, Any]):
+        """درج در کش پیش‌بینی با حذف ورودی‌های منقضی و قدیمی‌ترین‌ها"""
+        now = time.time()
+        cache = self.prediction_cache
+        cache[cache_key] = (now, result)
+        cache.move_to_end(cache_key)
+        
+        # ترتیب درج = ترتیب زمان؛ از ابتدا تا اولین ورودی معتبر حذف می‌شود
+        while cache:
+            oldest_time, _ = next(iter(cache.values()))
+            if now - oldest_time < self.prediction_cache_timeout and len(cache) <= PREDICTION_CACHE_MAX:
+                break
+            cache.popitem(last=False)
+    
+    async def _predict_match(self, query: str) -> Dict[str, Any]:
         """
         پیش‌بینی نتیجه مسابقه
         
@@ -595,7 +645,7 @@ class SportsPredictor:
             'h2h_advantage': h2h_advantage
         }
         
-        ai_prediction = await self.ai.predict(ai_input, 'sports')
+        ai_prediction = self.ai.predict(ai_input, 'sports')
         ai_score = ai_prediction.get('value', 0.5)
         
         # ==================== ترکیب نتایج ====================
@@ -723,8 +773,6 @@ class SportsPredictor:
         try:
             # TODO: دریافت از API واقعی
             # فعلاً داده‌های نمونه
-            import random
-            
             num_matches = random.randint(3, 10)
             for i in range(num_matches):
                 if random.random() > 0.6:
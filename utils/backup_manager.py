@@ -24,8 +24,12 @@ import schedule
 from typing import Dict, List, Optional
 import hashlib
 
+from config import KEEP_BACKUPS_DAYS
+
 logger = logging.getLogger(__name__)
 
+HASH_CHUNK_SIZE = 1024 * 1024  # خواندن تکه‌ای فایل برای checksum
+
 class BackupManager:
     """
     مدیریت خودکار پشتیبان‌گیری با قابلیت زمان‌بندی
@@ -128,9 +132,12 @@ class BackupManager:
             size_bytes = backup_file.stat().st_size
             size_mb = size_bytes / (1024 * 1024)
             
-            # محاسبه MD5 checksum
+            # محاسبه MD5 checksum (تکه‌تکه، بدون خواندن کل فایل در حافظه)
+            digest = hashlib.md5()
             with open(backup_file, 'rb') as f:
-                md5 = hashlib.md5(f.read()).hexdigest()
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+            md5 = digest.hexdigest()
             
             # به‌روزرسانی آمار
             self.stats['total_backups'] += 1
@@ -9,6 +9,7 @@
 
 import logging
 import sys
+import json
 from pathlib import Path
 from logging.handlers import RotatingFileHandler
 from datetime import datetime
@@ -149,8 +150,6 @@ class JsonLogger:
     
     def log_prediction(self, prediction_data: dict):
         """لاگ کردن پیش‌بینی"""
-        import json
-        
         log_entry = {
             'timestamp': datetime.now().isoformat(),
             'type': 'prediction',
@@ -161,8 +160,6 @@ class JsonLogger:
     
     def log_payment(self, payment_data: dict):
         """لاگ کردن پرداخت"""
-        import json
-        
         log_entry = {
             'timestamp': datetime.now().isoformat(),
             'type': 'payment',
@@ -173,8 +170,6 @@ class JsonLogger:
     
     def log_error(self, error_data: dict):
         """لاگ کردن خطا"""
-        import json
-        
         log_entry = {
             'timestamp': datetime.now().isoformat(),
             'type': 'error',
@@ -0,0 +1,11 @@
+# utils/markdown.py
+"""
+ابزارهای Markdown تلگرام (ParseMode.MARKDOWN قدیمی)
+"""
+
+# کاراکترهای خاص Markdown قدیمی؛ نام کاربر با _ یا * پیام را خراب می‌کند
+_MD_ESCAPE = str.maketrans({c: '\\' + c for c in '_*`['})
+
+def escape_markdown(text: str) -> str:
+    """escape متن کاربر قبل از قرار دادن در پیام Markdown"""
+    return text.translate(_MD_ESCAPE)
@@ -177,6 +177,9 @@ class TokenAnalyzer:
         self.cache = {}
         self.cache_timeout = 300  # 5 دقیقه
         
+        # تحلیل‌های در حال اجرا؛ درخواست هم‌زمان برای همان توکن منتظر همان تحلیل می‌ماند
+        self._inflight: Dict[str, asyncio.Future] = {}
+        
         # آماری
         self.stats = {
             'tokens_analyzed': 0,
@@ -271,6 +274,18 @@ class TokenAnalyzer:
             if time.time() - cached_time < self.cache_timeout:
                 return cached_data
         
+        inflight = self._inflight.get(cache_key)
+        if inflight is None:
+            inflight = asyncio.ensure_future(self._analyze_token(token_address, chain, cache_key))
+            self._inflight[cache_key] = inflight
+            inflight.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+        
+        # shield: لغو یک درخواست، تحلیل مشترک بقیه را لغو نمی‌کند
+        return await asyncio.shield(inflight)
+    
+    async def _analyze_token(self, token_address: str, chain: str, cache_key: str) -> Dict[str, Any]:
+        """تحلیل کامل توکن (بدون کش)"""
+        
         # تشخیص شبکه اگر داده نشده
         if not chain:
             chain = self.detect_chain(token_address)
@@ -310,7 +325,7 @@ class TokenAnalyzer:
             result['numerology'] = numerology_result
             
             # پیش‌بینی با AI
-            ai_prediction = await self.ai.predict({
+            ai_prediction = self.ai.predict({
                 'token_address': token_address,
                 'chain': chain,
                 'price': result.get('price_usd', 0),